@@ -0,0 +1,208 @@
+"""
+🔔 Assinaturas — Quem recebe quais alertas
+   Cada usuário escolhe categorias, lojas e desconto mínimo pelos comandos
+   do bot. As assinaturas ficam num arquivo JSON local.
+
+   Um índice (categoria, loja, faixa de desconto) → chats faz o roteamento
+   de um alerta ser só algumas consultas em dicionário, sem varrer usuários.
+   "*" no índice significa "qualquer categoria/loja".
+
+   Mudanças só marcam as assinaturas como alteradas: o arquivo é regravado
+   uma vez a cada GRAVACAO_ATRASO segundos, em JSON compacto e numa thread
+   (como o price_db), e na hora no desligamento com salvar().
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+from config import Config
+from models import Alerta
+
+logger = logging.getLogger("Assinaturas")
+
+TODAS = "*"
+
+# Faixas de desconto do índice (%) — o mínimo do usuário é arredondado para baixo
+FAIXA_DESCONTO = 5
+
+# Nome curto usado nos comandos → nome da loja no Produto
+LOJAS = {
+    "mercadolivre": "Mercado Livre",
+    "amazon": "Amazon Brasil",
+    "shopee": "Shopee",
+}
+
+# Espera antes de regravar o arquivo — junta várias mudanças numa gravação
+GRAVACAO_ATRASO = 5.0
+
+# chat_id → {"categorias": [...], "lojas": [...], "desconto_min": int}
+_assinantes: Dict[str, dict] = {}
+# (categoria, loja, faixa) → chats
+_indice: Dict[Tuple[str, str, int], Set[str]] = {}
+_carregado = False
+# Houve mudança ainda não gravada
+_sujo = False
+_gravacao = asyncio.Lock()
+_agendada: Optional[asyncio.Task] = None
+
+
+def _faixa(desconto: float) -> int:
+    return min(int(desconto) // FAIXA_DESCONTO * FAIXA_DESCONTO, 100)
+
+
+def _chaves(assinatura: dict):
+    for categoria in assinatura["categorias"]:
+        for loja in assinatura["lojas"]:
+            for faixa in range(assinatura["desconto_min"], 101, FAIXA_DESCONTO):
+                yield categoria, loja, faixa
+
+
+def _indexar(chat_id: str):
+    for chave in _chaves(_assinantes[chat_id]):
+        _indice.setdefault(chave, set()).add(chat_id)
+
+
+def _desindexar(chat_id: str):
+    for chave in _chaves(_assinantes[chat_id]):
+        chats = _indice.get(chave)
+        if chats is not None:
+            chats.discard(chat_id)
+            if not chats:
+                del _indice[chave]
+
+
+def _load():
+    global _carregado
+    if _carregado:
+        return
+    _carregado = True
+    if not os.path.exists(Config.ASSINATURAS_FILE):
+        return
+    try:
+        with open(Config.ASSINATURAS_FILE, "r", encoding="utf-8") as f:
+            _assinantes.update(json.load(f))
+    except Exception as e:
+        logger.error(f"Erro ao carregar assinaturas: {e}")
+        return
+    for chat_id in _assinantes:
+        _indexar(chat_id)
+    logger.info(f"🔔 {len(_assinantes)} assinantes carregados")
+
+
+def _save(assinantes: dict) -> bool:
+    tmp = f"{Config.ASSINATURAS_FILE}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps(assinantes, ensure_ascii=False, separators=(",", ":")))
+        os.replace(tmp, Config.ASSINATURAS_FILE)
+        return True
+    except Exception as e:
+        logger.error(f"Erro ao salvar assinaturas: {e}")
+        return False
+
+
+async def gravar():
+    """Grava o arquivo numa thread se algo mudou desde a última gravação"""
+    global _sujo
+    async with _gravacao:
+        if not _sujo:
+            return
+        _sujo = False
+        # Cópia rasa: _alterar() troca os campos no lugar enquanto a thread serializa
+        copia = {chat_id: dict(a) for chat_id, a in _assinantes.items()}
+        if not await asyncio.to_thread(_save, copia):
+            _sujo = True
+
+
+async def _gravar_depois():
+    await asyncio.sleep(GRAVACAO_ATRASO)
+    await gravar()
+
+
+def _marcar():
+    """Marca como alterado e agenda uma gravação, se ainda não houver uma"""
+    global _sujo, _agendada
+    _sujo = True
+    if _agendada is not None and not _agendada.done():
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # Fora do loop (scripts): não há quem grave depois
+        salvar()
+        return
+    _agendada = loop.create_task(_gravar_depois())
+
+
+def salvar():
+    """Grava as mudanças pendentes no arquivo, na hora (desligamento)"""
+    global _sujo
+    if _sujo and _save(_assinantes):
+        _sujo = False
+
+
+def _alterar(chat_id: str, **campos) -> dict:
+    """Aplica a mudança reindexando só o chat alterado"""
+    _load()
+    chat_id = str(chat_id)
+    if chat_id in _assinantes:
+        _desindexar(chat_id)
+    assinatura = _assinantes.setdefault(chat_id, {
+        "categorias": [TODAS],
+        "lojas": [TODAS],
+        "desconto_min": _faixa(Config.DESCONTO_MINIMO_PORCENTO),
+    })
+    assinatura.update(campos)
+    _indexar(chat_id)
+    _marcar()
+    return assinatura
+
+
+def assinar(chat_id, categorias: List[str]) -> dict:
+    return _alterar(chat_id, categorias=sorted(set(categorias)) or [TODAS])
+
+
+def definir_lojas(chat_id, lojas: List[str]) -> dict:
+    return _alterar(chat_id, lojas=sorted(set(lojas)) or [TODAS])
+
+
+def definir_desconto(chat_id, desconto_min: int) -> dict:
+    return _alterar(chat_id, desconto_min=_faixa(max(0, min(desconto_min, 100))))
+
+
+def cancelar(chat_id) -> bool:
+    _load()
+    chat_id = str(chat_id)
+    if chat_id not in _assinantes:
+        return False
+    _desindexar(chat_id)
+    del _assinantes[chat_id]
+    _marcar()
+    return True
+
+
+def get(chat_id) -> Optional[dict]:
+    _load()
+    return _assinantes.get(str(chat_id))
+
+
+def total() -> int:
+    _load()
+    return len(_assinantes)
+
+
+def destinatarios(alerta: Alerta) -> Set[str]:
+    """Chats assinantes deste alerta — no máximo 4 consultas ao índice"""
+    _load()
+    faixa = _faixa(alerta.desconto_pct)
+    chats: Set[str] = set()
+    for categoria in (alerta.categoria_key, TODAS):
+        for loja in (alerta.produto.loja, TODAS):
+            encontrados = _indice.get((categoria, loja, faixa))
+            if encontrados:
+                chats |= encontrados
+    return chats
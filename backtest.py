@@ -0,0 +1,303 @@
+"""
+🧪 Backtest — Replay offline das camadas do detector sobre o histórico
+   Roda uma grade de limiares (DESCONTO_MINIMO_PORCENTO, QUEDA_HISTORICO_MINIMA,
+   escala do PRECO_MINIMO_ABSOLUTO) sobre o price_history.json ou sobre
+   fixtures gravadas, e reporta por categoria:
+
+   • alertas   → quantos alertas o bot teria enviado (já deduplicados)
+   • reversão  → % dos alertas cujo preço voltou a subir depois
+                 (proxy de precisão: erro de preço costuma ser corrigido)
+
+   Cada amostra é um run de preço do price_db (ou um trecho de preço igual
+   nas fixtures), e a mediana histórica é ponderada pela duração, igual ao
+   get_preco_referencia.
+
+   As features de cada amostra são calculadas uma vez; a grade inteira é
+   avaliada com NumPy em blocos, sem repetir o replay por configuração.
+
+   Uso:
+     python backtest.py --desconto 30,40,50 --queda 30,40,50 --minimo 0.8,1,1.2
+     python backtest.py --fixtures scrapes.jsonl --csv resultado.csv
+
+   A camada estatística (CAMADA 4) depende da ordem das amostras e não
+   entra na grade.
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import sys
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from config import Config
+from detector import PRECO_MINIMO_ABSOLUTO, QUEDA_HISTORICO_MINIMA
+from price_db import DB_FILE, duracao_run
+
+# Alta mínima (x preço do alerta) nas amostras seguintes para contar como reversão
+FATOR_REVERSAO = 1.25
+# Quantas configurações avaliar por bloco (limita a matriz G × N em memória)
+BLOCO_GRADE = 64
+
+
+class Amostras:
+    """Colunas de amostras + features independentes dos limiares"""
+
+    def __init__(self, series: List[Tuple[str, str, List[float], List[float], List[float]]]):
+        """series: (anuncio_id, categoria, precos, originais, pesos) em ordem cronológica"""
+        self.categorias = sorted({cat for _, cat, precos, _, _ in series if precos})
+        codigo = {cat: i for i, cat in enumerate(self.categorias)}
+
+        cat, preco, desc_loja, queda, grupo, reverteu = [], [], [], [], [], []
+        grupos = 0
+        for _, categoria, precos, originais, pesos in series:
+            p = np.asarray(precos, dtype=np.float64)
+            o = np.asarray(originais, dtype=np.float64)
+            w = np.asarray(pesos, dtype=np.float64)
+            k = len(p)
+            if k == 0:
+                continue
+
+            # CAMADA 1 — desconto explícito da loja
+            with np.errstate(divide="ignore", invalid="ignore"):
+                d = np.where(o > p, (o - p) / o * 100, 0.0)
+
+            # CAMADA 3 — mediana ponderada expansiva (o detector registra antes de comparar)
+            q = _queda_vs_mediana(p, w)
+
+            # Dedup do monitor: cada (anúncio, preço) vira um grupo; depende dos
+            # limiares (só vale após um alerta) e é aplicado em avaliar_grade
+            unicos, inv = np.unique(p, return_inverse=True)
+            gr = grupos + inv
+            grupos += len(unicos)
+
+            # Reversão: algum preço posterior ≥ FATOR_REVERSAO × preço atual
+            maior_depois = np.maximum.accumulate(p[::-1])[::-1]
+            maior_depois = np.append(maior_depois[1:], 0.0)
+
+            cat.append(np.full(k, codigo[categoria], dtype=np.int32))
+            preco.append(p)
+            desc_loja.append(d)
+            queda.append(q)
+            grupo.append(gr)
+            reverteu.append(maior_depois >= p * FATOR_REVERSAO)
+
+        vazio = [np.empty(0)]
+        self.cat = np.concatenate(cat or [np.empty(0, dtype=np.int32)])
+        self.preco = np.concatenate(preco or vazio)
+        self.desc_loja = np.concatenate(desc_loja or vazio)
+        self.queda = np.concatenate(queda or vazio)
+        self.grupo = np.concatenate(grupo or [np.empty(0, dtype=np.int64)])
+        self.reverteu = np.concatenate(reverteu or [np.empty(0, dtype=bool)])
+        self.anuncios = len(series)
+
+        # CAMADA 2 — preço / mínimo absoluto da categoria (inf = sem limite)
+        limites = np.array(
+            [PRECO_MINIMO_ABSOLUTO.get(c, 0.0) for c in self.categorias], dtype=np.float64
+        )
+        lim = limites[self.cat] if len(self.cat) else np.empty(0)
+        with np.errstate(divide="ignore"):
+            self.razao_minimo = np.where(lim > 0, self.preco / lim, np.inf)
+
+        # Ordena por categoria para agregar com reduceat
+        ordem = np.argsort(self.cat, kind="stable")
+        for nome in ("cat", "preco", "desc_loja", "queda", "grupo", "reverteu", "razao_minimo"):
+            setattr(self, nome, getattr(self, nome)[ordem])
+        self.inicios = np.searchsorted(self.cat, np.arange(len(self.categorias)))
+
+        # Amostras agrupadas por (anúncio, preço), em ordem cronológica dentro
+        # do grupo, e a posição onde o grupo de cada uma começa
+        self.ordem_grupo = np.argsort(self.grupo, kind="stable")
+        g = self.grupo[self.ordem_grupo]
+        posicoes = np.arange(len(g))
+        comeco = np.ones(len(g), dtype=bool)
+        comeco[1:] = g[1:] != g[:-1]
+        self.inicio_grupo = np.maximum.accumulate(np.where(comeco, posicoes, 0)) if len(g) else posicoes
+
+    def __len__(self) -> int:
+        return len(self.preco)
+
+
+def _queda_vs_mediana(p: np.ndarray, w: np.ndarray) -> np.ndarray:
+    """
+    Queda (%) de cada run vs a mediana ponderada dos runs 0..i.
+    Linha i da matriz = runs até i ordenados por preço; os demais viram
+    +inf com peso 0 e vão para o fim.
+
+    Como no monitor ao vivo, o run i entra na própria linha com o peso de
+    um scan (é o primeiro scan com o preço novo); a duração completa dele
+    ainda é futuro nesse instante e só vale para as linhas seguintes.
+    """
+    k = len(p)
+    mascara = np.tri(k, dtype=bool)
+    precos = np.where(mascara, p[None, :], np.inf)
+    pesos = np.where(mascara, w[None, :], 0.0)
+    np.fill_diagonal(pesos, Config.SCAN_INTERVAL_MINUTES * 60)
+    ordem = np.argsort(precos, axis=1, kind="stable")
+    precos = np.take_along_axis(precos, ordem, axis=1)
+    acumulado = np.cumsum(np.take_along_axis(pesos, ordem, axis=1), axis=1)
+
+    metade = acumulado[:, -1:] / 2
+    linhas = np.arange(k)
+    j = np.argmax(acumulado >= metade, axis=1)
+    prox = np.minimum(j + 1, linhas)
+    # Exatamente no meio: média com o próximo preço, como get_preco_referencia
+    empate = np.isclose(acumulado[linhas, j], metade[:, 0]) & (j < linhas)
+    ref = np.where(empate, (precos[linhas, j] + precos[linhas, prox]) / 2, precos[linhas, j])
+    return np.where(ref > 0, (ref - p) / ref * 100, 0.0)
+
+
+def carregar_historico(caminho: str) -> Amostras:
+    """Lê o price_history.json do price_db (runs de preço)"""
+    with open(caminho, "r", encoding="utf-8") as f:
+        db = json.load(f)
+
+    series = []
+    for anuncio_id, entrada in db.items():
+        historico = entrada.get("historico", [])
+        if historico and "n" not in historico[0]:
+            raise SystemExit("❌ price_history.json no formato antigo — rode o bot uma vez para migrar")
+        series.append((
+            anuncio_id,
+            entrada.get("categoria", "?"),
+            [r["preco"] for r in historico],
+            [r.get("original", 0.0) for r in historico],
+            [duracao_run(r) for r in historico],
+        ))
+    return Amostras(series)
+
+
+def carregar_fixtures(caminho: str) -> Amostras:
+    """
+    Lê scrapes gravados em JSONL, um produto por linha:
+    {"anuncio_id", "categoria", "preco", "preco_original"} em ordem cronológica.
+    Scans seguidos com o mesmo preço viram um run, como no price_db.
+    """
+    intervalo = Config.SCAN_INTERVAL_MINUTES * 60
+    por_anuncio: Dict[str, Tuple[str, List[float], List[float], List[float]]] = {}
+    with open(caminho, "r", encoding="utf-8") as f:
+        for linha in f:
+            if not linha.strip():
+                continue
+            item = json.loads(linha)
+            _, precos, originais, pesos = por_anuncio.setdefault(
+                item["anuncio_id"], (item.get("categoria", "?"), [], [], [])
+            )
+            preco = float(item["preco"])
+            if precos and precos[-1] == preco:
+                pesos[-1] += intervalo
+                continue
+            precos.append(preco)
+            originais.append(float(item.get("preco_original") or 0.0))
+            pesos.append(intervalo)
+    return Amostras([(a, c, p, o, w) for a, (c, p, o, w) in por_anuncio.items()])
+
+
+def _deduplicar(amostras: Amostras, alerta: np.ndarray) -> np.ndarray:
+    """
+    Como o seen_ids do monitor: um (anúncio, preço) só é suprimido depois
+    de ter alertado na mesma configuração. Mantém só o primeiro alerta de
+    cada grupo — alertas anteriores no grupo = soma acumulada exclusiva.
+    """
+    a = alerta[:, amostras.ordem_grupo]
+    anteriores = np.cumsum(a, axis=1, dtype=np.int32) - a
+    anteriores -= anteriores[:, amostras.inicio_grupo]
+    primeiro = np.empty_like(alerta)
+    primeiro[:, amostras.ordem_grupo] = a & (anteriores == 0)
+    return primeiro
+
+
+def avaliar_grade(amostras: Amostras, grade: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    grade: (G, 3) com (desconto_min, queda_min, escala_minimo).
+    Retorna duas matrizes (G, C) por categoria: alertas e alertas revertidos.
+    """
+    G, C = len(grade), len(amostras.categorias)
+    alertas = np.zeros((G, C), dtype=np.int64)
+    revertidos = np.zeros((G, C), dtype=np.int64)
+    if len(amostras) == 0:
+        return alertas, revertidos
+
+    for ini in range(0, G, BLOCO_GRADE):
+        bloco = grade[ini:ini + BLOCO_GRADE]
+        desconto = bloco[:, 0:1]
+        queda = bloco[:, 1:2]
+        escala = bloco[:, 2:3]
+
+        alerta = (
+            (amostras.desc_loja[None, :] >= desconto)
+            | (amostras.razao_minimo[None, :] < escala)
+            | (amostras.queda[None, :] >= queda)
+        )
+        alerta = _deduplicar(amostras, alerta)
+
+        alertas[ini:ini + len(bloco)] = np.add.reduceat(
+            alerta, amostras.inicios, axis=1, dtype=np.int64
+        )
+        revertidos[ini:ini + len(bloco)] = np.add.reduceat(
+            alerta & amostras.reverteu[None, :], amostras.inicios, axis=1, dtype=np.int64
+        )
+
+    return alertas, revertidos
+
+
+def _lista(texto: str) -> List[float]:
+    return [float(v) for v in texto.split(",") if v.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay das camadas do detector")
+    parser.add_argument("--historico", default=DB_FILE, help="price_history.json")
+    parser.add_argument("--fixtures", help="JSONL com scrapes gravados (substitui o histórico)")
+    parser.add_argument("--desconto", default=str(Config.DESCONTO_MINIMO_PORCENTO),
+                        help="valores de DESCONTO_MINIMO_PORCENTO, separados por vírgula")
+    parser.add_argument("--queda", default=str(QUEDA_HISTORICO_MINIMA),
+                        help="valores de QUEDA_HISTORICO_MINIMA, separados por vírgula")
+    parser.add_argument("--minimo", default="1.0",
+                        help="escalas aplicadas ao PRECO_MINIMO_ABSOLUTO, separadas por vírgula")
+    parser.add_argument("--csv", help="grava o resultado por categoria neste CSV")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    amostras = carregar_fixtures(args.fixtures) if args.fixtures else carregar_historico(args.historico)
+    t_carga = time.perf_counter() - inicio
+
+    grade = np.array(
+        list(itertools.product(_lista(args.desconto), _lista(args.queda), _lista(args.minimo))),
+        dtype=np.float64,
+    )
+
+    inicio = time.perf_counter()
+    alertas, revertidos = avaliar_grade(amostras, grade)
+    t_grade = time.perf_counter() - inicio
+
+    print(
+        f"📦 {len(amostras)} amostras de {amostras.anuncios} anúncios "
+        f"({t_carga * 1000:.0f}ms) — {len(grade)} configurações em {t_grade * 1000:.0f}ms\n"
+    )
+    print(f"{'desconto':>8} {'queda':>6} {'mínimo':>7} {'alertas':>8} {'reversão':>9}  por categoria")
+    for g, (desconto, queda, escala) in enumerate(grade):
+        total = alertas[g].sum()
+        prec = revertidos[g].sum() / total * 100 if total else 0.0
+        por_cat = " ".join(
+            f"{cat}={alertas[g, c]}" for c, cat in enumerate(amostras.categorias) if alertas[g, c]
+        )
+        print(f"{desconto:>8.0f} {queda:>6.0f} {escala:>7.2f} {total:>8} {prec:>8.1f}%  {por_cat}")
+
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(["desconto", "queda", "escala_minimo", "categoria", "alertas", "revertidos", "reversao_pct"])
+            for g, (desconto, queda, escala) in enumerate(grade):
+                for c, cat in enumerate(amostras.categorias):
+                    n = int(alertas[g, c])
+                    r = int(revertidos[g, c])
+                    w.writerow([desconto, queda, escala, cat, n, r, round(r / n * 100, 1) if n else 0.0])
+        print(f"\n💾 Resultado por categoria salvo em {args.csv}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+⏱️ Benchmark — Decodificação das respostas do ML e da Shopee
+   Compara, sobre respostas gravadas da API de busca, o json.loads genérico
+   (o que resp.json() fazia) com a decodificação projetada via msgspec dos
+   scrapers. Reporta por página o tempo médio de decodificação e o pico de
+   memória alocada (tracemalloc).
+
+   amostras/ traz páginas de 20 itens no formato das duas APIs, incluindo
+   itens fora do padrão (quantidade float/string, nome numérico, preço
+   como objeto). Para gravar uma página nova:
+     curl -s "https://api.mercadolibre.com/sites/MLB/search?q=notebook&limit=20" > amostras/ml_notebook.json
+
+   Uso:
+     python bench_decode.py --ml amostras/ml_*.json --shopee amostras/shopee_*.json --repeticoes 300
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable, List
+
+from scrapers import mercadolivre, shopee
+
+
+def _tempo_medio_ms(decodificar: Callable[[bytes], object], corpo: bytes, repeticoes: int) -> float:
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        decodificar(corpo)
+    return (time.perf_counter() - inicio) / repeticoes * 1000
+
+
+def _pico_kb(decodificar: Callable[[bytes], object], corpo: bytes) -> float:
+    """Pico de memória alocada enquanto o resultado decodificado está vivo"""
+    tracemalloc.start()
+    try:
+        resultado = decodificar(corpo)
+        _, pico = tracemalloc.get_traced_memory()
+        del resultado
+    finally:
+        tracemalloc.stop()
+    return pico / 1024
+
+
+def _comparar(nome: str, arquivos: List[str], projetado: Callable[[bytes], list], repeticoes: int):
+    print(f"\n{nome}")
+    print(f"{'arquivo':<28} {'KB':>6} {'itens':>5} {'json ms':>8} {'proj ms':>8} {'json KB':>8} {'proj KB':>8}")
+    for caminho in arquivos:
+        with open(caminho, "rb") as f:
+            corpo = f.read()
+
+        itens = len(projetado(corpo))
+        t_json = _tempo_medio_ms(json.loads, corpo, repeticoes)
+        t_proj = _tempo_medio_ms(projetado, corpo, repeticoes)
+        m_json = _pico_kb(json.loads, corpo)
+        m_proj = _pico_kb(projetado, corpo)
+        print(
+            f"{os.path.basename(caminho)[:28]:<28} {len(corpo) / 1024:>6.0f} {itens:>5} "
+            f"{t_json:>8.3f} {t_proj:>8.3f} {m_json:>8.0f} {m_proj:>8.0f}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de decodificação das APIs de busca")
+    parser.add_argument("--ml", nargs="*", default=[], help="respostas gravadas do Mercado Livre")
+    parser.add_argument("--shopee", nargs="*", default=[], help="respostas gravadas da Shopee")
+    parser.add_argument("--repeticoes", type=int, default=100, help="decodificações por medição")
+    args = parser.parse_args(argv)
+
+    if not args.ml and not args.shopee:
+        parser.error("informe ao menos um arquivo com --ml ou --shopee")
+
+    if args.ml:
+        _comparar("🛒 Mercado Livre", args.ml, mercadolivre.decodificar, args.repeticoes)
+    if args.shopee:
+        _comparar("🛒 Shopee", args.shopee, shopee.decodificar, args.repeticoes)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,8 +6,9 @@
 """
 
 import asyncio
+import html
 import logging
-from telegram import Bot, Update
+from telegram import Update
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -15,15 +16,24 @@ from telegram.ext import (
     MessageHandler,
     filters,
 )
-from monitor import run_all_monitors, get_status
+import assinaturas
+import egress
+import entrega
+import hedge
+import keep_alive
+import loop_watchdog
+import memoria
+import price_db
+import snapshot
+from busca import buscar, formatar_busca
+from log_config import configurar_logging
+from digest import AgrupadorAlertas
+from models import Alerta
+from monitor import CATEGORIAS, executar_ciclo, get_status
 from config import Config
 
 # ── LOGGING ──
-logging.basicConfig(
-    format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
-    datefmt="%d/%m %H:%M:%S",
-    level=logging.INFO,
-)
+configurar_logging()
 logger = logging.getLogger("ErroBot")
 
 
@@ -42,6 +52,9 @@ async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "🧥 <b>Roupa Masculina</b> — completo\n\n"
         "📡 Alertas chegam aqui automaticamente!\n\n"
         "📋 <b>Comandos:</b>\n"
+        "/buscar &lt;termo&gt; — buscar agora nas 3 lojas\n"
+        "/assinar &lt;categorias&gt; — receber alertas aqui\n"
+        "/minhas — ver sua assinatura\n"
         "/status — ver status do monitor\n"
         "/categorias — categorias ativas\n"
         "/ping — testar bot"
@@ -51,6 +64,21 @@ async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def cmd_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     status = get_status()
+    loop = loop_watchdog.get_status(top=1)
+    pior = loop["top_locais"][0]["local"] if loop["top_locais"] else "—"
+    linha_hedge = ""
+    if Config.HEDGE:
+        linha_hedge = "🏇 Hedge (taxa · p99 efetivo/sem hedge):\n" + "".join(
+            f"   {loja}: <code>{h['taxa_hedge_pct']:.0f}% · "
+            f"{h['p99_efetivo_ms'] or 0}/{h['p99_sem_hedge_ms'] or 0}ms</code>\n"
+            for loja, h in hedge.get_status().items()
+        )
+    saidas = egress.get_status()
+    linha_egress = ""
+    if saidas["ativo"]:
+        linha_egress = (
+            f"🌍 Saídas saudáveis: <code>{saidas['saudaveis']}/{len(saidas['saidas'])}</code>\n"
+        )
     msg = (
         "📊 <b>STATUS DO MONITOR</b>\n"
         "━━━━━━━━━━━━━━━━━━━━\n\n"
@@ -58,7 +86,17 @@ async def cmd_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"🎯 Erros encontrados: <code>{status['erros_total']}</code>\n"
         f"⏱ Último scan: <code>{status['ultimo_scan']}</code>\n"
         f"⏰ Próximo scan: <code>{status['proximo_scan']}</code>\n"
-        f"🏪 Lojas monitoradas: <code>Mercado Livre, Amazon, Shopee</code>\n\n"
+        f"⌛ Duração do último ciclo: <code>{status['ultimo_ciclo_segundos']:.0f}s</code>\n"
+        f"🚧 Ciclos que estouraram o prazo: <code>{status['ciclos_estourados']}</code>\n"
+        f"⏭️ Disparos sobrepostos: <code>{status['ciclos_pulados']}</code>\n"
+        f"🐢 Lag do loop (p99/máx): <code>{loop['lag_p99_ms']:.0f}/{loop['lag_max_ms']:.0f}ms</code>\n"
+        f"🐢 Callbacks lentos: <code>{loop['callbacks_lentos']}</code> — pior: <code>{html.escape(pior)}</code>\n"
+        f"🧠 Memória (RSS/limite): <code>{memoria.rss_mb():.0f}/{Config.MEMORIA_LIMITE_MB}MB</code>\n"
+        f"🏪 Lojas monitoradas: <code>Mercado Livre, Amazon, Shopee</code>\n"
+        f"{linha_egress}"
+        f"{linha_hedge}"
+        f"🔔 Assinantes: <code>{assinaturas.total()}</code> — "
+        f"na fila de envio: <code>{entrega.get_status()['na_fila']}</code>\n\n"
         "✅ Bot operacional!"
     )
     await update.message.reply_text(msg, parse_mode="HTML")
@@ -81,6 +119,103 @@ async def cmd_categorias(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(msg, parse_mode="HTML")
 
 
+async def cmd_buscar(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    termo = " ".join(context.args or []).strip()
+    if not termo:
+        await update.message.reply_text("ℹ️ Use: /buscar &lt;termo&gt;  (ex: /buscar dior sauvage)", parse_mode="HTML")
+        return
+
+    resposta = await buscar(termo)
+    if resposta is None:
+        await update.message.reply_text("⏳ Muitas buscas em andamento. Tente de novo em alguns segundos.")
+        return
+
+    categoria, resultados, do_cache = resposta
+    await update.message.reply_text(
+        formatar_busca(termo, categoria, resultados, do_cache),
+        parse_mode="HTML",
+        disable_web_page_preview=True,
+    )
+
+
+def _descrever_assinatura(assinatura: dict) -> str:
+    categorias = assinatura["categorias"]
+    lojas = assinatura["lojas"]
+    cats_txt = "todas" if assinaturas.TODAS in categorias else ", ".join(
+        CATEGORIAS[c]["nome"] for c in categorias
+    )
+    lojas_txt = "todas" if assinaturas.TODAS in lojas else ", ".join(lojas)
+    return (
+        "🔔 <b>SUA ASSINATURA</b>\n"
+        "━━━━━━━━━━━━━━━━━━━━\n\n"
+        f"📦 Categorias: <code>{cats_txt}</code>\n"
+        f"🏪 Lojas: <code>{lojas_txt}</code>\n"
+        f"🏷️ Desconto mínimo: <code>{assinatura['desconto_min']}%</code>\n\n"
+        "/assinar · /lojas · /desconto · /cancelar"
+    )
+
+
+async def cmd_assinar(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    pedidas = [a.lower() for a in context.args or []]
+    if not pedidas or "todas" in pedidas:
+        categorias = []
+    else:
+        invalidas = [c for c in pedidas if c not in CATEGORIAS]
+        if invalidas:
+            await update.message.reply_text(
+                f"❓ Categoria(s) desconhecida(s): {html.escape(', '.join(invalidas))}\n"
+                f"Use: /assinar {' | '.join(CATEGORIAS)} | todas",
+                parse_mode="HTML",
+            )
+            return
+        categorias = pedidas
+    assinatura = assinaturas.assinar(update.effective_chat.id, categorias)
+    await update.message.reply_text(_descrever_assinatura(assinatura), parse_mode="HTML")
+
+
+async def cmd_lojas(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    pedidas = [a.lower() for a in context.args or []]
+    if not pedidas or "todas" in pedidas:
+        lojas = []
+    else:
+        invalidas = [loja for loja in pedidas if loja not in assinaturas.LOJAS]
+        if invalidas:
+            await update.message.reply_text(
+                f"❓ Loja(s) desconhecida(s): {html.escape(', '.join(invalidas))}\n"
+                f"Use: /lojas {' | '.join(assinaturas.LOJAS)} | todas",
+                parse_mode="HTML",
+            )
+            return
+        lojas = [assinaturas.LOJAS[loja] for loja in pedidas]
+    assinatura = assinaturas.definir_lojas(update.effective_chat.id, lojas)
+    await update.message.reply_text(_descrever_assinatura(assinatura), parse_mode="HTML")
+
+
+async def cmd_desconto(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        desconto = int((context.args or [""])[0].rstrip("%"))
+    except ValueError:
+        await update.message.reply_text("ℹ️ Use: /desconto 60  (desconto mínimo em %)")
+        return
+    assinatura = assinaturas.definir_desconto(update.effective_chat.id, desconto)
+    await update.message.reply_text(_descrever_assinatura(assinatura), parse_mode="HTML")
+
+
+async def cmd_minhas(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    assinatura = assinaturas.get(update.effective_chat.id)
+    if not assinatura:
+        await update.message.reply_text("🔕 Você não tem assinatura. Use /assinar para receber alertas.")
+        return
+    await update.message.reply_text(_descrever_assinatura(assinatura), parse_mode="HTML")
+
+
+async def cmd_cancelar(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if assinaturas.cancelar(update.effective_chat.id):
+        await update.message.reply_text("🔕 Assinatura cancelada. Você não vai mais receber alertas.")
+    else:
+        await update.message.reply_text("ℹ️ Você não tinha assinatura ativa.")
+
+
 async def cmd_ping(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("🏓 Pong! Bot online e funcionando!")
 
@@ -92,28 +227,60 @@ async def msg_desconhecido(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 # ── SCHEDULER JOB ──
+# Com o max_instances=1 padrão do APScheduler, um disparo com o ciclo anterior
+# ainda rodando é descartado antes de chegar ao executar_ciclo — e o
+# CICLO_SOBREPOSICAO / ciclos_pulados nunca veriam a sobreposição
+JOB_MONITOR_KWARGS = {"max_instances": 2, "coalesce": True}
+
+
 async def job_monitor(context: ContextTypes.DEFAULT_TYPE):
     logger.info("🔍 Iniciando ciclo de monitoramento...")
+    agrupador = AgrupadorAlertas()
+    enviados = 0
+
+    async def on_alerta(alerta: Alerta):
+        nonlocal enviados
+        for grupo in agrupador.adicionar(alerta):
+            enviados += entrega.rotear(grupo)
+
+    async def despachar_vencidos():
+        # Digests cuja janela venceu enquanto o ciclo ainda roda
+        nonlocal enviados
+        while True:
+            await asyncio.sleep(5)
+            for grupo in agrupador.vencidos():
+                enviados += entrega.rotear(grupo)
+
+    despachante = asyncio.create_task(despachar_vencidos())
     try:
-        erros = await run_all_monitors()
-        if erros:
-            bot: Bot = context.bot
-            for erro in erros:
-                try:
-                    await bot.send_message(
-                        chat_id=Config.TELEGRAM_CHAT_ID,
-                        text=erro,
-                        parse_mode="HTML",
-                        disable_web_page_preview=False,
-                    )
-                    await asyncio.sleep(1.5)
-                except Exception as e:
-                    logger.error(f"Erro ao enviar mensagem: {e}")
-            logger.info(f"✅ {len(erros)} alertas enviados")
-        else:
-            logger.info("ℹ️ Nenhum erro de preço encontrado neste ciclo")
+        if await executar_ciclo(on_alerta=on_alerta) is None:
+            return
     except Exception as e:
         logger.error(f"❌ Erro no ciclo de monitoramento: {e}")
+    finally:
+        despachante.cancel()
+        for grupo in agrupador.drenar():
+            enviados += entrega.rotear(grupo)
+
+    if enviados:
+        logger.info(f"✅ {enviados} mensagens enfileiradas")
+    else:
+        logger.info("ℹ️ Nenhum erro de preço encontrado neste ciclo")
+
+
+async def _post_init(app: Application):
+    keep_alive.registrar_loop(asyncio.get_running_loop())
+    loop_watchdog.iniciar()
+    memoria.iniciar()
+    entrega.iniciar(app.bot)
+
+
+async def _post_shutdown(app: Application):
+    # Runs de preço abertos (fim/n só em memória) — o price_db não entra no snapshot
+    price_db.salvar()
+    assinaturas.salvar()
+    snapshot.salvar()
+    logger.info("💾 Snapshot salvo no desligamento")
 
 
 # ── MAIN ──
@@ -125,13 +292,29 @@ def main():
     if not Config.TELEGRAM_CHAT_ID:
         raise ValueError("❌ TELEGRAM_CHAT_ID não configurado!")
 
-    app = Application.builder().token(Config.TELEGRAM_TOKEN).build()
+    # Warm restart: estado do monitor, dedup e cursor do ciclo
+    snapshot.restaurar()
+
+    app = (
+        Application.builder()
+        .token(Config.TELEGRAM_TOKEN)
+        .post_init(_post_init)
+        .post_shutdown(_post_shutdown)
+        .build()
+    )
 
     # Handlers
     app.add_handler(CommandHandler("start", cmd_start))
     app.add_handler(CommandHandler("status", cmd_status))
     app.add_handler(CommandHandler("categorias", cmd_categorias))
     app.add_handler(CommandHandler("ping", cmd_ping))
+    app.add_handler(CommandHandler("assinar", cmd_assinar))
+    app.add_handler(CommandHandler("lojas", cmd_lojas))
+    app.add_handler(CommandHandler("desconto", cmd_desconto))
+    app.add_handler(CommandHandler("minhas", cmd_minhas))
+    app.add_handler(CommandHandler("cancelar", cmd_cancelar))
+    # block=False: a busca roda em paralelo sem travar os outros comandos
+    app.add_handler(CommandHandler("buscar", cmd_buscar, block=False))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, msg_desconhecido))
 
     # Scheduler
@@ -141,6 +324,7 @@ def main():
         interval=interval,
         first=30,
         name="monitor_job",
+        job_kwargs=JOB_MONITOR_KWARGS,
     )
 
     logger.info(f"✅ Bot iniciado! Monitorando a cada {Config.SCAN_INTERVAL_MINUTES} minutos.")
@@ -0,0 +1,168 @@
+"""
+🔎 Busca — /buscar sob demanda nas 3 lojas
+   Dispara os scrapers em paralelo com prazo por requisição, responde do
+   cache (com TTL) quando o termo foi buscado há pouco e classifica os
+   resultados mais baratos com o veredito do detector.
+
+   Tem orçamento próprio para não competir com o ciclo agendado do
+   monitor: de concorrência (BUSCA_CONCORRENCIA) e de requisições por
+   saída e loja no egress (EGRESS_BUSCA_REQ_POR_MINUTO).
+"""
+
+import asyncio
+import html
+import logging
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import egress
+import memoria
+from config import Config
+from detector import analisar_produto
+from models import Produto
+from monitor import CATEGORIAS, formatar_preco
+from scrapers.amazon import scrape_amazon
+from scrapers.mercadolivre import scrape_mercadolivre
+from scrapers.shopee import scrape_shopee
+
+logger = logging.getLogger("Busca")
+
+
+@dataclass(frozen=True, slots=True)
+class ResultadoBusca:
+    produto: Produto
+    e_erro: bool
+    motivo: str
+    desconto_pct: float
+
+
+# termo normalizado → (expira_em, categoria, resultados)
+_cache: "OrderedDict[str, Tuple[float, str, List[ResultadoBusca]]]" = OrderedDict()
+_semaforo = asyncio.Semaphore(Config.BUSCA_CONCORRENCIA)
+
+
+def _normalizar(termo: str) -> str:
+    return re.sub(r"\s+", " ", termo.strip().lower())
+
+
+def _inferir_categoria(termo: str) -> str:
+    """Categoria cujas keywords mais compartilham palavras com o termo ("" se nenhuma)"""
+    palavras = set(termo.split())
+    melhor, melhor_score = "", 0
+    for cat_key, cat_info in CATEGORIAS.items():
+        score = max(len(palavras & set(kw.split())) for kw in cat_info["keywords"])
+        if score > melhor_score:
+            melhor, melhor_score = cat_key, score
+    return melhor
+
+
+def _do_cache(termo: str) -> Optional[Tuple[str, List[ResultadoBusca]]]:
+    entrada = _cache.get(termo)
+    if entrada is None:
+        return None
+    expira, categoria, resultados = entrada
+    if time.monotonic() >= expira:
+        del _cache[termo]
+        return None
+    _cache.move_to_end(termo)
+    return categoria, resultados
+
+
+def _guardar(termo: str, categoria: str, resultados: List[ResultadoBusca]):
+    _cache[termo] = (time.monotonic() + Config.BUSCA_CACHE_TTL_SEGUNDOS, categoria, resultados)
+    _cache.move_to_end(termo)
+    while len(_cache) > Config.BUSCA_CACHE_MAX:
+        _cache.popitem(last=False)
+
+
+def _reduzir_cache(alvo: int) -> int:
+    removidos = 0
+    while len(_cache) > alvo:
+        _cache.popitem(last=False)
+        removidos += 1
+    return removidos
+
+
+memoria.registrar(
+    "busca_cache", lambda: len(_cache), _reduzir_cache,
+    lambda k: list(_cache.items())[:k], Config.BUSCA_CACHE_MAX,
+)
+
+
+async def buscar(termo: str) -> Optional[Tuple[str, List[ResultadoBusca], bool]]:
+    """
+    Busca o termo nas 3 lojas.
+
+    Retorna (categoria, resultados, veio_do_cache), ou None quando todas as
+    vagas de busca estão ocupadas.
+    """
+    termo = _normalizar(termo)
+    em_cache = _do_cache(termo)
+    if em_cache is not None:
+        return em_cache[0], em_cache[1], True
+
+    if _semaforo.locked():
+        return None
+
+    async with _semaforo:
+        categoria = _inferir_categoria(termo)
+        preco_max = CATEGORIAS[categoria]["preco_max"] if categoria else Config.BUSCA_PRECO_MAX
+
+        # As tarefas copiam o contexto: os scrapers consomem os buckets da busca
+        token = egress.ORCAMENTO.set("busca")
+        try:
+            tarefas = [
+                asyncio.create_task(scrape_mercadolivre(termo, preco_max)),
+                asyncio.create_task(scrape_amazon(termo, preco_max)),
+                asyncio.create_task(scrape_shopee(termo, preco_max)),
+            ]
+        finally:
+            egress.ORCAMENTO.reset(token)
+        prontas, atrasadas = await asyncio.wait(tarefas, timeout=Config.BUSCA_DEADLINE_SEGUNDOS)
+        for tarefa in atrasadas:
+            tarefa.cancel()
+        if atrasadas:
+            logger.info(f"⏰ /buscar '{termo}': {len(atrasadas)} loja(s) fora do prazo")
+
+        produtos: List[Produto] = []
+        for tarefa in prontas:
+            if tarefa.exception() is None:
+                produtos.extend(tarefa.result())
+
+        produtos.sort(key=lambda p: p.preco)
+        resultados = []
+        for produto in produtos[:Config.BUSCA_MAX_RESULTADOS]:
+            e_erro, motivo, desconto = analisar_produto(produto, categoria, registrar=False)
+            resultados.append(ResultadoBusca(produto, e_erro, motivo, desconto))
+
+        # Não guarda resposta vazia de loja que estourou o prazo
+        if resultados or not atrasadas:
+            _guardar(termo, categoria, resultados)
+        return categoria, resultados, False
+
+
+def formatar_busca(termo: str, categoria: str, resultados: List[ResultadoBusca], do_cache: bool) -> str:
+    termo = html.escape(termo)
+    if not resultados:
+        return f"🔎 Nenhum resultado com desconto para <b>{termo}</b> agora."
+
+    cat_nome = CATEGORIAS[categoria]["nome"] if categoria else "sem categoria"
+    linhas = []
+    for i, r in enumerate(resultados, start=1):
+        p = r.produto
+        veredito = f"💥 {r.motivo}" if r.e_erro else f"✅ preço normal ({p.desconto_pct:.0f}% OFF na loja)"
+        linhas.append(
+            f"{i}. <b>{html.escape(p.nome[:60])}</b>\n"
+            f"   {formatar_preco(p.preco)} — {p.loja} — <a href='{html.escape(p.link, quote=True)}'>ver</a>\n"
+            f"   {veredito}"
+        )
+
+    return (
+        f"🔎 <b>BUSCA:</b> {termo}\n"
+        f"📦 <b>Categoria:</b> {cat_nome}{' · ⚡ cache' if do_cache else ''}\n"
+        f"━━━━━━━━━━━━━━━━━━━━\n\n"
+        + "\n\n".join(linhas)
+    )
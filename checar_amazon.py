@@ -0,0 +1,96 @@
+"""
+🛒 Checagem — Desconto dos resultados da Amazon
+   Monta resultados de busca de mentira e confere, com o scrapers/amazon.py
+   de verdade, de onde sai o desconto:
+
+   • badges que não são desconto ("Mais vendido", "Top 10") não contam
+   • só "-NN%" ou "NN% off" no .savingsPercentage contam como desconto
+   • sem preço riscado o preco_original fica 0.0 e o detector não acusa a
+     CAMADA 1 só pelo percentual
+
+   Não acessa a internet.
+
+   Uso:
+     python checar_amazon.py
+"""
+
+import sys
+from typing import Optional
+
+from lxml import html
+
+import price_db
+from detector import analisar_produto
+from scrapers.amazon import _processar_item_amazon
+
+
+def _item(preco: str, riscado: str = "", badge: str = "", economia: str = "") -> str:
+    partes = [
+        '<div data-asin="B0TESTE">',
+        '<h2><a href="/dp/B0TESTE"><span>Produto de teste</span></a></h2>',
+        f'<span class="a-price"><span class="a-offscreen">{preco}</span></span>',
+    ]
+    if riscado:
+        partes.append(
+            f'<span class="a-price a-text-price"><span class="a-offscreen">{riscado}</span></span>'
+        )
+    if badge:
+        partes.append(f'<span class="a-badge-text">{badge}</span>')
+    if economia:
+        partes.append(f'<span class="savingsPercentage">{economia}</span>')
+    partes.append("</div>")
+    return "".join(partes)
+
+
+def _processar(fragmento: str):
+    return _processar_item_amazon(html.fromstring(fragmento), "teste")
+
+
+def _camada1(produto) -> Optional[str]:
+    e_erro, motivo, _ = analisar_produto(produto, "perfume", registrar=False)
+    return motivo if e_erro else None
+
+
+def main() -> int:
+    # Só avalia: nada vai para o price_history.json
+    price_db._cache = {}
+    falhas = 0
+
+    def conferir(ok: bool, texto: str):
+        nonlocal falhas
+        falhas += not ok
+        print(f"{'✅' if ok else '❌'} {texto}")
+
+    for badge in ("Mais vendido", "Top 10", "Escolha da Amazon", "1º mais vendido"):
+        produto = _processar(_item("R$ 1.000,00", badge=badge))
+        conferir(produto is None, f"badge {badge!r} sem preço riscado não vira desconto")
+
+    produto = _processar(_item("R$ 1.000,00", riscado="R$ 1.250,00", badge="Top 10"))
+    conferir(
+        produto is not None and round(produto.desconto_pct) == 20,
+        "badge 'Top 10' não substitui o desconto do preço riscado",
+    )
+
+    for economia in ("-65%", "65% off", "- 65 %"):
+        produto = _processar(_item("R$ 350,00", economia=economia))
+        conferir(
+            produto is not None and produto.desconto_pct == 65 and produto.preco_original == 0.0,
+            f"economia {economia!r}: desconto 65%, preco_original 0.0",
+        )
+        if produto is not None:
+            motivo = _camada1(produto) or ""
+            conferir("Desconto da loja" not in motivo, f"economia {economia!r} sozinha não aciona a CAMADA 1")
+
+    produto = _processar(_item("R$ 350,00", economia="Economize R$ 10"))
+    conferir(produto is None, "economia sem percentual não vira desconto")
+
+    produto = _processar(_item("R$ 350,00", riscado="R$ 1.000,00", economia="-65%"))
+    conferir(
+        produto is not None and produto.preco_original == 1000.0,
+        "com preço riscado o preco_original é o da loja",
+    )
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""
+🌍 Checagem — Pool de egress contra proxies locais
+   Sobe 3 proxies HTTP de mentira em 127.0.0.1 (servidores aiohttp que
+   respondem às requisições em forma absoluta) e confere, com o egress.py
+   de verdade:
+
+   • preferida/rotação: uma rajada vai pela saída preferida da loja e,
+     esgotado o orçamento dela, transborda para as outras
+   • orçamento por saída: nenhum proxy recebe mais que o bucket permite e
+     o contador de cada saída bate com o que o proxy viu
+   • saúde: o proxy que só responde 403 sai do pool após
+     EGRESS_BLOQUEIOS_EJECAO bloqueios e as requisições seguintes evitam ele
+
+   Não acessa a internet.
+
+   Uso:
+     python checar_egress.py
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from collections import Counter
+from typing import Dict, List
+
+import aiohttp
+from aiohttp import web
+
+import egress
+from config import Config
+
+PORTAS = (18801, 18802, 18803)
+URL = "http://lojaficticia.test/busca"
+REQ_POR_MINUTO = 60
+
+
+async def _subir_proxies(hits: Counter, status: Dict[int, int]) -> List[web.AppRunner]:
+    runners = []
+    for porta in PORTAS:
+        async def responder(request: web.Request, porta=porta) -> web.Response:
+            hits[porta] += 1
+            return web.json_response({"porta": porta}, status=status.get(porta, 200))
+
+        app = web.Application()
+        app.router.add_route("GET", "/{caminho:.*}", responder)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", porta).start()
+        runners.append(runner)
+    return runners
+
+
+def _configurar():
+    Config.EGRESS_PROXIES = [f"http://127.0.0.1:{p}" for p in PORTAS]
+    Config.EGRESS_INCLUIR_DIRETO = False
+    Config.EGRESS_REQ_POR_MINUTO = REQ_POR_MINUTO
+    Config.EGRESS_BLOQUEIOS_EJECAO = 3
+    Config.EGRESS_QUARENTENA_SEGUNDOS = 60
+    egress._pool = egress._montar_pool()
+
+
+async def _rajada(session: aiohttp.ClientSession, loja: str, n: int) -> List[int]:
+    """n requisições seguidas à loja; devolve a porta do proxy que atendeu cada uma"""
+    portas = []
+    for _ in range(n):
+        async with egress.requisicao(session, loja, URL) as resp:
+            portas.append((await resp.json())["porta"])
+    return portas
+
+
+def _porta(eg: egress.Egress) -> int:
+    return int(eg.nome.rsplit(":", 1)[1])
+
+
+async def _main() -> int:
+    logging.basicConfig(level=logging.WARNING, format="%(name)s: %(message)s")
+    _configurar()
+    hits: Counter = Counter()
+    status: Dict[int, int] = {}
+    runners = await _subir_proxies(hits, status)
+    falhas = 0
+
+    def conferir(ok: bool, texto: str):
+        nonlocal falhas
+        falhas += not ok
+        print(f"{'✅' if ok else '❌'} {texto}")
+
+    try:
+        async with aiohttp.ClientSession() as session:
+            # 1) Preferida e transbordo: 3 × RAJADA requisições de uma vez
+            inicio = time.monotonic()
+            saidas = await _rajada(session, "loja_a", 3 * egress.RAJADA)
+            decorrido = time.monotonic() - inicio
+            preferida = _porta(egress._preferida("loja_a", egress._pool))
+            conferir(
+                saidas[:egress.RAJADA] == [preferida] * egress.RAJADA,
+                f"rajada começa pela preferida da loja (:{preferida})",
+            )
+            conferir(len(set(saidas)) == len(PORTAS), f"transborda para as outras saídas: {Counter(saidas)}")
+
+            # 2) Orçamento por saída: o que cada proxy viu cabe no bucket e bate com o contador
+            teto = int(egress.RAJADA + decorrido * REQ_POR_MINUTO / 60)
+            conferir(
+                all(hits[p] <= teto for p in PORTAS),
+                f"nenhum proxy acima do orçamento ({dict(hits)}, teto {teto})",
+            )
+            conferir(
+                all(hits[_porta(eg)] == eg.requisicoes for eg in egress._pool),
+                "contador de requisições de cada saída bate com o proxy",
+            )
+
+            # 3) Saúde: a preferida da loja_b passa a responder 403
+            preferida_b = egress._preferida("loja_b", egress._pool)
+            status[_porta(preferida_b)] = 403
+            await _rajada(session, "loja_b", Config.EGRESS_BLOQUEIOS_EJECAO)
+            conferir(
+                not preferida_b.saudavel(time.monotonic()) and preferida_b.ejecoes == 1,
+                f"{preferida_b.nome} ejetada após {Config.EGRESS_BLOQUEIOS_EJECAO} respostas 403",
+            )
+            conferir(egress.saudaveis() == len(PORTAS) - 1, f"saudaveis() = {egress.saudaveis()}")
+
+            await asyncio.sleep(egress.RAJADA * 60 / REQ_POR_MINUTO)
+            saidas = await _rajada(session, "loja_b", 2 * egress.RAJADA)
+            conferir(
+                _porta(preferida_b) not in saidas,
+                "requisições seguintes evitam a saída em quarentena",
+            )
+    finally:
+        for runner in runners:
+            await runner.cleanup()
+
+    print()
+    for s in egress.get_status()["saidas"]:
+        situacao = "ok" if s["saudavel"] else f"quarentena {s['quarentena_s']}s"
+        print(f"   {s['nome']}: score {s['score']}, {s['requisicoes']} req, {s['falhas']} falhas, {situacao}")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main()))
@@ -0,0 +1,82 @@
+"""
+🔁 Checagem — Sobreposição de ciclos no JobQueue do bot
+   Agenda o job_monitor do bot.py num JobQueue real (APScheduler) com um
+   ciclo falso mais lento que o intervalo e confere que os disparos
+   sobrepostos chegam ao executar_ciclo e contam em ciclos_pulados
+   (CICLO_SOBREPOSICAO=pular) ou agendam uma nova rodada (enfileirar).
+   Também roda sem bot.JOB_MONITOR_KWARGS, para mostrar que aí o
+   APScheduler descarta os disparos e o contador fica em zero.
+
+   Não acessa o Telegram nem as lojas.
+
+   Uso:
+     python checar_sobreposicao.py
+"""
+
+import asyncio
+import logging
+import sys
+from typing import Optional
+
+from telegram.ext import Application
+
+import bot
+import monitor
+from config import Config
+
+INTERVALO = 0.5
+DURACAO_CICLO = 1.3
+ESPERA = 3.2
+
+
+async def _rodar(modo: str, job_kwargs: Optional[dict]) -> dict:
+    Config.CICLO_SOBREPOSICAO = modo
+    monitor._state["ciclos_pulados"] = 0
+    ciclos = 0
+
+    async def ciclo_lento(on_alerta=None, deadline=None):
+        nonlocal ciclos
+        ciclos += 1
+        await asyncio.sleep(DURACAO_CICLO)
+        return []
+
+    monitor.run_all_monitors = ciclo_lento
+    app = Application.builder().token("0:checagem").build()
+    job = app.job_queue.run_repeating(
+        bot.job_monitor, interval=INTERVALO, first=0, name="monitor_job",
+        job_kwargs=job_kwargs,
+    )
+    await app.job_queue.start()
+    await asyncio.sleep(ESPERA)
+    # Sem novos disparos, o ciclo em andamento (e a rodada enfileirada) termina
+    job.schedule_removal()
+    await app.job_queue.stop(wait=True)
+    return {"ciclos": ciclos, "pulados": monitor._state["ciclos_pulados"]}
+
+
+async def _main() -> int:
+    # O bot.py liga o logging em INFO — aqui só interessam os avisos
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("Monitor").setLevel(logging.ERROR)
+    logging.getLogger("apscheduler").setLevel(logging.ERROR)
+    falhas = 0
+
+    padrao = await _rodar("pular", None)
+    print(f"ℹ️ sem job_kwargs: {padrao['ciclos']} ciclos, {padrao['pulados']} disparos pulados")
+
+    pular = await _rodar("pular", bot.JOB_MONITOR_KWARGS)
+    ok = pular["pulados"] > 0
+    falhas += not ok
+    print(f"{'✅' if ok else '❌'} pular: {pular['ciclos']} ciclos, {pular['pulados']} disparos pulados")
+
+    enfileirar = await _rodar("enfileirar", bot.JOB_MONITOR_KWARGS)
+    # Cada disparo sobreposto vira uma rodada logo após o ciclo atual
+    ok = enfileirar["pulados"] > 0 and enfileirar["ciclos"] > pular["ciclos"]
+    falhas += not ok
+    print(f"{'✅' if ok else '❌'} enfileirar: {enfileirar['ciclos']} ciclos, "
+          f"{enfileirar['pulados']} disparos enfileirados")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main()))
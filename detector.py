@@ -1,15 +1,18 @@
 """
 🔎 Detector — Motor de detecção de erro de preço
-   Usa 3 camadas combinadas para detectar erros mesmo sem preço riscado
+   Usa 4 camadas combinadas para detectar erros mesmo sem preço riscado
 
    CAMADA 1 → Preço riscado da loja (desconto explícito)
    CAMADA 2 → Preço mínimo fixo por categoria (limiar absoluto)
    CAMADA 3 → Queda brusca vs histórico (mediana dos últimos preços)
+   CAMADA 4 → Anomalia estatística (z-score robusto EWMA + MAD)
 """
 
 import logging
 from typing import Optional, Tuple
+import estatistica
 from config import Config
+from models import Produto
 from price_db import get_preco_referencia, preco_minimo_historico, registrar_preco
 
 logger = logging.getLogger("Detector")
@@ -32,25 +35,30 @@ QUEDA_HISTORICO_MINIMA = 40  # 40% abaixo da mediana histórica
 
 
 def analisar_produto(
-    produto: dict,
+    produto: Produto,
     categoria_key: str,
+    registrar: bool = True,
 ) -> Tuple[bool, str, float]:
     """
-    Analisa se um produto é erro de preço usando as 3 camadas.
+    Analisa se um produto é erro de preço usando as 4 camadas.
+    Com registrar=False só avalia (ex.: /buscar), sem tocar no histórico.
 
     Retorna: (é_erro, motivo, desconto_pct)
     """
-    prod_id  = produto.get("id", "")
-    nome     = produto.get("nome", "")
-    preco    = produto.get("preco", 0.0)
-    loja     = produto.get("loja", "")
-    preco_original = produto.get("preco_original", 0.0)
+    preco          = produto.preco
+    preco_original = produto.preco_original
 
     if preco <= 0:
         return False, "", 0.0
 
-    # ── Registra preço no histórico (sempre) ──
-    registrar_preco(prod_id, nome, preco, loja)
+    # ── Registra preço no histórico ──
+    if registrar:
+        registrar_preco(produto, categoria_key)
+
+    # ── Estado estatístico: avalia antes de incorporar o preço atual ──
+    anomalia = estatistica.avaliar(produto.anuncio_id, categoria_key, preco)
+    if registrar:
+        estatistica.atualizar(produto.anuncio_id, categoria_key, preco)
 
     # ────────────────────────────────────────
     # CAMADA 1 — Desconto explícito da loja
@@ -75,7 +83,7 @@ def analisar_produto(
     # ────────────────────────────────────────
     # CAMADA 3 — Queda brusca vs histórico
     # ────────────────────────────────────────
-    referencia = get_preco_referencia(prod_id)
+    referencia = get_preco_referencia(produto.anuncio_id)
     if referencia and referencia > 0:
         queda = ((referencia - preco) / referencia) * 100
         if queda >= QUEDA_HISTORICO_MINIMA:
@@ -85,4 +93,17 @@ def analisar_produto(
                 queda,
             )
 
+    # ────────────────────────────────────────
+    # CAMADA 4 — Anomalia estatística (EWMA + MAD)
+    # ────────────────────────────────────────
+    if anomalia:
+        escopo, z, referencia = anomalia
+        queda = ((referencia - preco) / referencia) * 100
+        if queda >= Config.ESTAT_QUEDA_MINIMA:
+            return (
+                True,
+                f"📐 Preço anômalo para o {escopo} (z={z:.1f}, típico: R${referencia:,.2f})",
+                queda,
+            )
+
     return False, "", 0.0
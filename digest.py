@@ -0,0 +1,76 @@
+"""
+📨 Digest — Agrupamento de alertas para economizar mensagens no Telegram
+   Alertas do mesmo grupo (loja, categoria, seller...) dentro de uma janela
+   viram uma única mensagem com os top N descontos + contagem.
+   Alertas graves (ERRO ABSURDO) saem na hora, sem esperar a janela.
+"""
+
+import time
+from typing import Dict, List, Tuple
+
+from config import Config
+from models import Alerta
+from monitor import CATEGORIAS, formatar_alerta, formatar_digest
+
+
+def _chave(alerta: Alerta) -> Tuple:
+    valores = {
+        "loja": alerta.produto.loja,
+        "categoria": alerta.categoria_key,
+        "seller": alerta.produto.seller,
+        "keyword": alerta.produto.keyword,
+    }
+    return tuple(valores.get(campo, "") for campo in Config.DIGEST_CHAVES)
+
+
+def formatar(grupo: List[Alerta]) -> str:
+    """Mensagem de um grupo: alerta normal se for um só, digest se forem vários"""
+    if len(grupo) == 1:
+        alerta = grupo[0]
+        return formatar_alerta(
+            alerta.produto, CATEGORIAS[alerta.categoria_key], alerta.motivo, alerta.desconto_pct
+        )
+    return formatar_digest(grupo, Config.DIGEST_TOP_N)
+
+
+class AgrupadorAlertas:
+    """
+    Junta alertas por grupo até a janela vencer.
+
+    adicionar() devolve o que deve sair imediatamente;
+    vencidos() devolve os grupos cuja janela acabou;
+    drenar() esvazia tudo (fim do ciclo).
+    """
+
+    def __init__(self):
+        # chave → (instante do primeiro alerta, alertas)
+        self._grupos: Dict[Tuple, Tuple[float, List[Alerta]]] = {}
+
+    def adicionar(self, alerta: Alerta) -> List[List[Alerta]]:
+        if (
+            Config.DIGEST_JANELA_SEGUNDOS <= 0
+            or alerta.desconto_pct >= Config.DIGEST_DESCONTO_IMEDIATO
+        ):
+            return [[alerta]]
+
+        chave = _chave(alerta)
+        if chave not in self._grupos:
+            self._grupos[chave] = (time.monotonic(), [])
+        self._grupos[chave][1].append(alerta)
+        return []
+
+    def vencidos(self) -> List[List[Alerta]]:
+        agora = time.monotonic()
+        prontos = [
+            chave for chave, (inicio, _) in self._grupos.items()
+            if agora - inicio >= Config.DIGEST_JANELA_SEGUNDOS
+        ]
+        return [self._grupos.pop(chave)[1] for chave in prontos]
+
+    def drenar(self) -> List[List[Alerta]]:
+        grupos = [alertas for _, alertas in self._grupos.values()]
+        self._grupos.clear()
+        return grupos
+
+    def __len__(self) -> int:
+        return sum(len(alertas) for _, alertas in self._grupos.values())
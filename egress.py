@@ -0,0 +1,250 @@
+"""
+🌍 Egress — Pool de proxies de saída para os scrapers
+   Cada loja limita requisições por IP. Com EGRESS_PROXIES configurado,
+   as requisições dos 3 scrapers saem por um pool de proxies (mais o IP
+   do Render, se EGRESS_INCLUIR_DIRETO):
+
+   • orçamento próprio (token bucket) por saída e por loja, separado entre
+     o ciclo do monitor e o /buscar (ORCAMENTO)
+   • score de saúde (média exponencial de respostas 2xx)
+   • 403/429 seguidos tiram a saída do pool por uma quarentena
+   • cada loja tem uma saída preferida (fixa enquanto saudável); quando o
+     orçamento dela acaba, a requisição vai pela próxima com orçamento
+
+   O monitor divide o intervalo entre keywords pelo número de saídas
+   saudáveis — o limite real por IP fica com os buckets.
+"""
+
+import asyncio
+import logging
+import random
+import time
+import zlib
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from config import Config
+
+logger = logging.getLogger("Egress")
+
+# Peso de cada resposta no score de saúde
+ALPHA_SAUDE = 0.2
+# Requisições que um bucket acumula parado
+RAJADA = 3
+
+# Estado compartilhado pela requisição original e seu hedge (ver hedge.py):
+# guarda os User-Agents já usados para o hedge sair com outro
+PAR_HEDGE: ContextVar[Optional[dict]] = ContextVar("par_hedge", default=None)
+# Orçamento consumido pela requisição: "monitor" (ciclo agendado) ou "busca"
+# (/buscar) — cada um tem seus buckets, e uma rajada de buscas não atrasa o ciclo
+ORCAMENTO: ContextVar[str] = ContextVar("orcamento", default="monitor")
+
+
+class _Balde:
+    """Token bucket não bloqueante — quem espera é o adquirir()"""
+
+    def __init__(self, por_minuto: float):
+        # EGRESS_REQ_POR_MINUTO=0 (ou menos) = sem limite
+        self.ilimitado = por_minuto <= 0
+        self.taxa = por_minuto / 60
+        self.tokens = float(RAJADA)
+        self.atualizado = time.monotonic()
+
+    def _repor(self):
+        agora = time.monotonic()
+        self.tokens = min(RAJADA, self.tokens + (agora - self.atualizado) * self.taxa)
+        self.atualizado = agora
+
+    def tentar(self) -> bool:
+        if self.ilimitado:
+            return True
+        self._repor()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def espera(self) -> float:
+        if self.ilimitado:
+            return 0.0
+        self._repor()
+        return max(0.0, (1 - self.tokens) / self.taxa)
+
+
+class Egress:
+    __slots__ = (
+        "nome", "proxy", "score", "bloqueios_seguidos", "ejetado_ate",
+        "requisicoes", "falhas", "ejecoes", "_baldes",
+    )
+
+    def __init__(self, nome: str, proxy: Optional[str]):
+        self.nome = nome
+        self.proxy = proxy
+        self.score = 1.0
+        self.bloqueios_seguidos = 0
+        self.ejetado_ate = 0.0
+        self.requisicoes = 0
+        self.falhas = 0
+        self.ejecoes = 0
+        self._baldes: Dict[Tuple[str, str], _Balde] = {}
+
+    def balde(self, loja: str) -> _Balde:
+        orcamento = ORCAMENTO.get()
+        balde = self._baldes.get((orcamento, loja))
+        if balde is None:
+            por_minuto = (
+                Config.EGRESS_BUSCA_REQ_POR_MINUTO if orcamento == "busca" else Config.EGRESS_REQ_POR_MINUTO
+            )
+            balde = self._baldes[(orcamento, loja)] = _Balde(por_minuto)
+        return balde
+
+    def saudavel(self, agora: float) -> bool:
+        return agora >= self.ejetado_ate
+
+
+def _nome_proxy(url: str) -> str:
+    """host:porta, sem credenciais — é o que aparece em logs e no /status"""
+    return url.rsplit("@", 1)[-1].split("://", 1)[-1].rstrip("/")
+
+
+def _montar_pool() -> List[Egress]:
+    pool = [Egress(_nome_proxy(url), url) for url in Config.EGRESS_PROXIES]
+    if Config.EGRESS_INCLUIR_DIRETO or not pool:
+        pool.insert(0, Egress("direto", None))
+    return pool
+
+
+_pool: List[Egress] = _montar_pool()
+
+
+def ativo() -> bool:
+    return bool(Config.EGRESS_PROXIES)
+
+
+def _saudaveis(agora: float) -> List[Egress]:
+    return [eg for eg in _pool if eg.saudavel(agora)]
+
+
+def saudaveis() -> int:
+    """Saídas fora de quarentena (mínimo 1, para dividir o intervalo do monitor)"""
+    return max(1, len(_saudaveis(time.monotonic())))
+
+
+def _preferida(loja: str, candidatos: List[Egress]) -> Egress:
+    """Rendezvous hash: a loja fica na mesma saída enquanto ela estiver no pool"""
+    return max(candidatos, key=lambda eg: zlib.crc32(f"{loja}|{eg.nome}".encode()))
+
+
+def _candidatos(loja: str) -> List[Egress]:
+    candidatos = _saudaveis(time.monotonic())
+    if not candidatos:
+        # Todas em quarentena: seguir com todas é melhor que parar o ciclo
+        candidatos = list(_pool)
+    preferida = _preferida(loja, candidatos)
+    resto = sorted((eg for eg in candidatos if eg is not preferida), key=lambda eg: -eg.score)
+    return [preferida] + resto
+
+
+def tem_orcamento(loja: str) -> bool:
+    """Há orçamento imediato para mais uma requisição à loja (sem consumir)"""
+    return any(eg.balde(loja).espera() == 0 for eg in _candidatos(loja))
+
+
+def _user_agent_do_par(kwargs: dict):
+    """No par original/hedge, cada requisição sai com um User-Agent diferente"""
+    par = PAR_HEDGE.get()
+    if par is None:
+        return
+    headers = dict(kwargs.get("headers") or {})
+    usados = par.setdefault("user_agents", set())
+    if headers.get("User-Agent") in usados:
+        livres = [ua for ua in Config.USER_AGENTS if ua not in usados]
+        if livres:
+            headers["User-Agent"] = random.choice(livres)
+    usados.add(headers.get("User-Agent"))
+    kwargs["headers"] = headers
+
+
+async def adquirir(loja: str) -> Egress:
+    """Saída para a próxima requisição à loja, esperando orçamento se preciso"""
+    if not ativo():
+        eg = _pool[0]
+        eg.requisicoes += 1
+        # Sem proxies o ritmo fica com o REQUEST_DELAY e nada espera aqui; o
+        # bucket só contabiliza, para o hedge respeitar o orçamento da loja
+        eg.balde(loja).tentar()
+        return eg
+
+    while True:
+        candidatos = _candidatos(loja)
+        for eg in candidatos:
+            if eg.balde(loja).tentar():
+                eg.requisicoes += 1
+                return eg
+        await asyncio.sleep(min(eg.balde(loja).espera() for eg in candidatos))
+
+
+def registrar(eg: Egress, loja: str, status: Optional[int]):
+    """Atualiza a saúde da saída; status None = erro de conexão/timeout"""
+    ok = status is not None and 200 <= status < 300
+    eg.score += ALPHA_SAUDE * ((1.0 if ok else 0.0) - eg.score)
+    if not ok:
+        eg.falhas += 1
+
+    if status in (403, 429):
+        eg.bloqueios_seguidos += 1
+        if eg.bloqueios_seguidos >= Config.EGRESS_BLOQUEIOS_EJECAO and ativo():
+            eg.ejetado_ate = time.monotonic() + Config.EGRESS_QUARENTENA_SEGUNDOS
+            eg.ejecoes += 1
+            eg.bloqueios_seguidos = 0
+            # Volta da quarentena em observação
+            eg.score = 0.5
+            logger.warning(
+                "🚫 Saída %s fora do pool por %ds (%d bloqueios seguidos em %s)",
+                eg.nome, Config.EGRESS_QUARENTENA_SEGUNDOS, Config.EGRESS_BLOQUEIOS_EJECAO, loja,
+                extra={"loja": loja, "status": status},
+            )
+    elif status is not None:
+        eg.bloqueios_seguidos = 0
+
+
+@asynccontextmanager
+async def requisicao(
+    session: aiohttp.ClientSession, loja: str, url: str, **kwargs
+) -> AsyncIterator[aiohttp.ClientResponse]:
+    """session.get() pela saída escolhida para a loja, registrando o resultado"""
+    eg = await adquirir(loja)
+    _user_agent_do_par(kwargs)
+    registrado = False
+    try:
+        async with session.get(url, proxy=eg.proxy, **kwargs) as resp:
+            registrar(eg, loja, resp.status)
+            registrado = True
+            yield resp
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        if not registrado:
+            registrar(eg, loja, None)
+        raise
+
+
+def get_status() -> dict:
+    agora = time.monotonic()
+    return {
+        "ativo": ativo(),
+        "saudaveis": saudaveis(),
+        "saidas": [
+            {
+                "nome": eg.nome,
+                "saudavel": eg.saudavel(agora),
+                "quarentena_s": max(0, round(eg.ejetado_ate - agora)),
+                "score": round(eg.score, 2),
+                "requisicoes": eg.requisicoes,
+                "falhas": eg.falhas,
+                "ejecoes": eg.ejecoes,
+            }
+            for eg in list(_pool)
+        ],
+    }
@@ -0,0 +1,241 @@
+"""
+📬 Entrega — Fila de envio para o canal e os assinantes
+   Os alertas são roteados (canal principal + assinantes do índice) e
+   enfileirados; um worker envia respeitando o limite global do Telegram
+   (~30 msg/s) e o intervalo mínimo por chat. O ciclo de detecção só
+   enfileira, nunca espera o envio.
+
+   As mensagens não enviadas entram no snapshot. Um alerta só sai dos
+   pendentes do monitor depois que todas as mensagens que o contêm foram
+   enviadas ou descartadas: erro definitivo do Telegram (BadRequest,
+   Forbidden) descarta na hora; falha transitória (rede, flood control)
+   volta para a fila com backoff, até MAX_TENTATIVAS.
+"""
+
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from telegram import Bot
+from telegram.error import BadRequest, Forbidden, RetryAfter
+
+import assinaturas
+import snapshot
+from config import Config
+from digest import formatar
+from models import Alerta
+from monitor import confirmar_entrega
+
+logger = logging.getLogger("Entrega")
+
+# Envios simultâneos — a latência de cada send_message não limita a vazão
+WORKERS = 8
+# Falhas transitórias seguidas antes de descartar a mensagem
+MAX_TENTATIVAS = 5
+# Espera antes da tentativa n: BACKOFF_BASE · 2^(n-1), até BACKOFF_MAX (segundos)
+BACKOFF_BASE = 5.0
+BACKOFF_MAX = 300.0
+
+_fila: "asyncio.Queue[int]" = asyncio.Queue()
+# nº da mensagem → (chat_id, texto, ids dos alertas) — tudo que ainda não foi entregue
+_envios: Dict[int, Tuple[str, str, Tuple[str, ...]]] = {}
+# id do alerta (produto.id) → mensagens dele ainda não entregues
+_restantes: Dict[str, int] = {}
+# nº da mensagem → falhas transitórias até agora
+_tentativas: Dict[int, int] = {}
+_sequencia = 0
+_workers: List[asyncio.Task] = []
+# chat → instante reservado para o próximo envio
+_proximo_envio: Dict[str, float] = {}
+# nº da mensagem → horário já reservado para ela (volta à fila quando chegar)
+_reservas: Dict[int, float] = {}
+_metricas = {"enviadas": 0, "falhas": 0, "reenvios": 0, "descartadas": 0, "assinantes_removidos": 0}
+
+
+class _Balde:
+    """Token bucket simples para o limite global de mensagens"""
+
+    def __init__(self, taxa: float):
+        self.taxa = taxa
+        self.tokens = taxa
+        self.atualizado = time.monotonic()
+
+    async def consumir(self):
+        while True:
+            agora = time.monotonic()
+            self.tokens = min(self.taxa, self.tokens + (agora - self.atualizado) * self.taxa)
+            self.atualizado = agora
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.taxa)
+
+
+def _enfileirar(chat_id: str, texto: str, ids: Tuple[str, ...]):
+    global _sequencia
+    _sequencia += 1
+    _envios[_sequencia] = (chat_id, texto, ids)
+    for prod_id in ids:
+        _restantes[prod_id] = _restantes.get(prod_id, 0) + 1
+    _fila.put_nowait(_sequencia)
+
+
+def _concluir(ids: Tuple[str, ...]):
+    """Uma mensagem com estes alertas saiu — confirma os que não faltam mais"""
+    for prod_id in ids:
+        restantes = _restantes.get(prod_id, 0) - 1
+        if restantes > 0:
+            _restantes[prod_id] = restantes
+            continue
+        _restantes.pop(prod_id, None)
+        confirmar_entrega(prod_id)
+
+
+def na_fila(prod_id: str) -> bool:
+    """Alerta com mensagens ainda esperando envio"""
+    return prod_id in _restantes
+
+
+def _exportar_snapshot() -> list:
+    return list(_envios.values())
+
+
+def _importar_snapshot(envios: list):
+    for chat_id, texto, ids in envios:
+        _enfileirar(chat_id, texto, tuple(ids))
+
+
+snapshot.registrar("entrega", _exportar_snapshot, _importar_snapshot)
+
+
+def rotear(grupo: List[Alerta]) -> int:
+    """
+    Enfileira o grupo para o canal principal e para cada assinante.
+    Assinantes que casam com os mesmos alertas recebem o mesmo texto,
+    formatado uma única vez. Retorna quantas mensagens foram enfileiradas.
+    """
+    enfileiradas = 0
+    todos = tuple(a.produto.id for a in grupo)
+    if Config.TELEGRAM_CHAT_ID:
+        _enfileirar(str(Config.TELEGRAM_CHAT_ID), formatar(grupo), todos)
+        enfileiradas += 1
+
+    por_chat: Dict[str, List[int]] = defaultdict(list)
+    for i, alerta in enumerate(grupo):
+        for chat_id in assinaturas.destinatarios(alerta):
+            por_chat[chat_id].append(i)
+    por_chat.pop(str(Config.TELEGRAM_CHAT_ID), None)
+
+    por_selecao: Dict[Tuple[int, ...], List[str]] = defaultdict(list)
+    for chat_id, indices in por_chat.items():
+        por_selecao[tuple(indices)].append(chat_id)
+
+    for indices, chats in por_selecao.items():
+        texto = formatar([grupo[i] for i in indices])
+        ids = tuple(todos[i] for i in indices)
+        for chat_id in chats:
+            _enfileirar(chat_id, texto, ids)
+        enfileiradas += len(chats)
+
+    # Alerta sem nenhum destinatário não tem o que esperar
+    for prod_id in todos:
+        if prod_id not in _restantes:
+            confirmar_entrega(prod_id)
+
+    return enfileiradas
+
+
+async def _enviar(bot: Bot, chat_id: str, texto: str) -> bool:
+    """True quando a mensagem não precisa mais ser enviada (saiu ou erro definitivo)"""
+    for _ in range(2):
+        try:
+            await bot.send_message(
+                chat_id=chat_id,
+                text=texto,
+                parse_mode="HTML",
+                disable_web_page_preview=False,
+            )
+            _metricas["enviadas"] += 1
+            return True
+        except RetryAfter as e:
+            logger.warning(f"⏳ Flood control do Telegram — aguardando {e.retry_after}s")
+            await asyncio.sleep(e.retry_after)
+        except (Forbidden, BadRequest) as e:
+            # Usuário bloqueou o bot, chat não existe mais ou a mensagem é
+            # inválida (ex: "Can't parse entities") — reenviar não adianta
+            chat_sumiu = isinstance(e, Forbidden) or "chat not found" in str(e).lower()
+            if chat_sumiu and chat_id != str(Config.TELEGRAM_CHAT_ID) and assinaturas.cancelar(chat_id):
+                _metricas["assinantes_removidos"] += 1
+                logger.info(f"🔕 Assinante {chat_id} removido: {e}")
+            else:
+                logger.error(f"Erro definitivo ao enviar mensagem para {chat_id}: {e}")
+            _metricas["falhas"] += 1
+            _metricas["descartadas"] += 1
+            return True
+        except Exception as e:
+            logger.warning(f"Falha transitória ao enviar mensagem para {chat_id}: {e}")
+            break
+    _metricas["falhas"] += 1
+    return False
+
+
+def _reagendar(seq: int, ids: Tuple[str, ...]):
+    """Falha transitória: volta para a fila após o backoff ou desiste"""
+    tentativas = _tentativas.get(seq, 0) + 1
+    if tentativas >= MAX_TENTATIVAS:
+        chat_id = _envios.pop(seq)[0]
+        _tentativas.pop(seq, None)
+        _metricas["descartadas"] += 1
+        logger.error(f"Mensagem para {chat_id} descartada após {tentativas} tentativas")
+        _concluir(ids)
+        return
+    _tentativas[seq] = tentativas
+    _metricas["reenvios"] += 1
+    espera = min(BACKOFF_BASE * 2 ** (tentativas - 1), BACKOFF_MAX)
+    asyncio.get_running_loop().call_later(espera, _fila.put_nowait, seq)
+
+
+async def _trabalhar(bot: Bot, balde: _Balde):
+    while True:
+        seq = await _fila.get()
+        chat_id, texto, ids = _envios[seq]
+        try:
+            # Reserva o horário na primeira passada: mantém a ordem e o
+            # intervalo por chat mesmo com vários workers. Se ainda não
+            # chegou, a mensagem volta à fila na hora certa e o worker fica
+            # livre para outros chats
+            if _reservas.pop(seq, None) is None:
+                agora = time.monotonic()
+                horario = max(agora, _proximo_envio.get(chat_id, 0.0))
+                _proximo_envio[chat_id] = horario + Config.TELEGRAM_INTERVALO_POR_CHAT
+                if horario > agora:
+                    _reservas[seq] = horario
+                    asyncio.get_running_loop().call_later(horario - agora, _fila.put_nowait, seq)
+                    continue
+            await balde.consumir()
+            if await _enviar(bot, chat_id, texto):
+                del _envios[seq]
+                _tentativas.pop(seq, None)
+                _concluir(ids)
+            else:
+                _reagendar(seq, ids)
+            snapshot.salvar_se_preciso()
+        finally:
+            _fila.task_done()
+
+
+def iniciar(bot: Bot):
+    """Sobe os workers de envio (chamar de dentro do loop)"""
+    if _workers:
+        return
+    balde = _Balde(Config.TELEGRAM_MSGS_POR_SEGUNDO)
+    loop = asyncio.get_running_loop()
+    for i in range(WORKERS):
+        _workers.append(loop.create_task(_trabalhar(bot, balde), name=f"entrega-{i}"))
+
+
+def get_status() -> dict:
+    # na_fila conta tudo que ainda não foi entregue, inclusive o que espera o backoff
+    return {**_metricas, "na_fila": len(_envios), "em_reenvio": len(_tentativas)}
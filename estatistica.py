@@ -0,0 +1,150 @@
+"""
+📐 Estatística — Detecção robusta incremental (EWMA + MAD)
+   Mantém, por anúncio e por categoria, poucos floats atualizados em O(1):
+
+   • média e variância exponenciais (EWMA) do log do preço
+   • mediana e MAD (desvio absoluto mediano) estimados em streaming
+
+   O z-score robusto  z = (x − mediana) / (1.4826 · MAD)  compara o preço
+   atual com o comportamento recente sem varrer o histórico.
+   Tudo é feito em escala log, então z mede queda relativa.
+"""
+
+import math
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import memoria
+import snapshot
+from config import Config
+
+# Fator que torna o MAD comparável ao desvio-padrão de uma normal
+_K_MAD = 1.4826
+
+# Piso do MAD em escala log (~2%) — evita z infinito em preço que nunca muda
+_MAD_MINIMO = 0.02
+
+
+class EstatisticaRobusta:
+    """Estado incremental de uma série de preços (em log)"""
+
+    __slots__ = ("n", "media", "var", "mediana", "mad")
+
+    def __init__(self):
+        self.n = 0
+        self.media = 0.0
+        self.var = 0.0
+        self.mediana = 0.0
+        self.mad = 0.0
+
+    def atualizar(self, x: float):
+        self.n += 1
+        if self.n == 1:
+            self.media = x
+            self.mediana = x
+            return
+        if self.n == 2:
+            self.mad = abs(x - self.mediana)
+
+        # EWMA da média e da variância
+        alpha = max(Config.ESTAT_ALPHA, 1.0 / self.n)
+        diff = x - self.media
+        incr = alpha * diff
+        self.media += incr
+        self.var = (1 - alpha) * (self.var + diff * incr)
+
+        # Mediana e MAD por aproximação estocástica de quantil:
+        # anda um passo proporcional à escala na direção do novo valor
+        passo = alpha * max(self.mad, _MAD_MINIMO)
+        if x > self.mediana:
+            self.mediana += passo
+        elif x < self.mediana:
+            self.mediana -= passo
+
+        desvio = abs(x - self.mediana)
+        if desvio > self.mad:
+            self.mad += passo
+        elif desvio < self.mad:
+            self.mad = max(self.mad - passo, 0.0)
+
+    def z_robusto(self, x: float) -> float:
+        return (x - self.mediana) / (_K_MAD * max(self.mad, _MAD_MINIMO))
+
+    def z_ewma(self, x: float) -> float:
+        return (x - self.media) / max(math.sqrt(self.var), _MAD_MINIMO)
+
+    def __getstate__(self):
+        return (self.n, self.media, self.var, self.mediana, self.mad)
+
+    def __setstate__(self, estado):
+        self.n, self.media, self.var, self.mediana, self.mad = estado
+
+
+# anuncio_id → estado (do atualizado há mais tempo ao mais recente) / categoria → estado
+_por_anuncio: "OrderedDict[str, EstatisticaRobusta]" = OrderedDict()
+_por_categoria: Dict[str, EstatisticaRobusta] = {}
+
+
+def avaliar(anuncio_id: str, categoria_key: str, preco: float) -> Optional[Tuple[str, float, float]]:
+    """
+    Avalia o preço contra o estado atual (sem atualizar).
+
+    Retorna (escopo, z_robusto, referencia) do primeiro escopo com amostras
+    suficientes em que o preço é anômalo — "anúncio" antes de "categoria" —
+    ou None se o preço estiver dentro do esperado.
+    """
+    if preco <= 0:
+        return None
+    x = math.log(preco)
+
+    for escopo, estado in (
+        ("anúncio", _por_anuncio.get(anuncio_id)),
+        ("categoria", _por_categoria.get(categoria_key)),
+    ):
+        if estado is None or estado.n < Config.ESTAT_MIN_AMOSTRAS:
+            continue
+        z = estado.z_robusto(x)
+        if z <= -Config.ESTAT_Z_LIMIAR and estado.z_ewma(x) <= -Config.ESTAT_Z_LIMIAR:
+            return escopo, z, math.exp(estado.mediana)
+    return None
+
+
+def atualizar(anuncio_id: str, categoria_key: str, preco: float):
+    """Incorpora o preço ao estado do anúncio e da categoria"""
+    if preco <= 0:
+        return
+    x = math.log(preco)
+    _por_anuncio.setdefault(anuncio_id, EstatisticaRobusta()).atualizar(x)
+    _por_anuncio.move_to_end(anuncio_id)
+    _por_categoria.setdefault(categoria_key, EstatisticaRobusta()).atualizar(x)
+
+
+def _exportar_snapshot() -> dict:
+    return {"anuncio": _por_anuncio, "categoria": _por_categoria}
+
+
+def _importar_snapshot(dados: dict):
+    _por_anuncio.update(dados.get("anuncio", {}))
+    _por_categoria.update(dados.get("categoria", {}))
+
+
+snapshot.registrar("estatistica", _exportar_snapshot, _importar_snapshot)
+
+
+def _reduzir(alvo: int) -> int:
+    """Descarta os anúncios atualizados há mais tempo (LRU, como o price_db.podar)"""
+    excesso = len(_por_anuncio) - alvo
+    if excesso <= 0:
+        return 0
+    for _ in range(excesso):
+        _por_anuncio.popitem(last=False)
+    return excesso
+
+
+memoria.registrar(
+    "estatistica",
+    lambda: len(_por_anuncio),
+    _reduzir,
+    lambda k: list(_por_anuncio.items())[:k],
+    Config.MEMORIA_ESTAT_MAX_ANUNCIOS,
+)
@@ -0,0 +1,148 @@
+"""
+🏇 Hedge — Segunda requisição quando uma loja demora demais
+   Cada keyword espera a loja mais lenta do asyncio.gather. Com HEDGE=1,
+   se a chamada a uma loja passar do p95 de latência observado para ela,
+   uma segunda chamada é disparada (sessão e conexão novas, outro
+   User-Agent) e vale a que responder primeiro.
+
+   O hedge respeita o orçamento da loja: só sai se o egress tiver token
+   imediato e se os hedges recentes estiverem abaixo de HEDGE_MAX_FRACAO
+   das chamadas. A chamada perdedora termina em background só para medir
+   a latência que teríamos sem hedge (p99 efetivo × p99 sem hedge).
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional, Set, TypeVar
+
+import egress
+from config import Config
+
+logger = logging.getLogger("Hedge")
+
+T = TypeVar("T")
+
+# Janela de latências por loja usada para o percentil e para as métricas
+JANELA = 200
+
+_em_voo: Set[asyncio.Task] = set()
+
+
+def _percentil(valores, p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+class _Loja:
+    __slots__ = ("latencias", "efetivas", "sem_hedge", "decisoes", "chamadas", "hedges", "vitorias")
+
+    def __init__(self):
+        # Cada chamada individual (original ou hedge) que terminou
+        self.latencias: deque = deque(maxlen=JANELA)
+        # O que o monitor esperou × o que a chamada original levou
+        self.efetivas: deque = deque(maxlen=JANELA)
+        self.sem_hedge: deque = deque(maxlen=JANELA)
+        # True para as chamadas recentes que dispararam hedge
+        self.decisoes: deque = deque(maxlen=JANELA)
+        self.chamadas = 0
+        self.hedges = 0
+        self.vitorias = 0
+
+    def limiar(self) -> Optional[float]:
+        """Latência (s) a partir da qual vale disparar o hedge"""
+        if len(self.latencias) < Config.HEDGE_MIN_AMOSTRAS:
+            return None
+        return _percentil(self.latencias, Config.HEDGE_PERCENTIL)
+
+    def pode_hedge(self) -> bool:
+        return sum(self.decisoes) < Config.HEDGE_MAX_FRACAO * max(len(self.decisoes), 1)
+
+
+_lojas: Dict[str, _Loja] = {}
+
+
+def _loja(nome: str) -> _Loja:
+    estado = _lojas.get(nome)
+    if estado is None:
+        estado = _lojas[nome] = _Loja()
+    return estado
+
+
+def _disparar(estado: _Loja, fazer: Callable[[], Awaitable[T]], original: bool) -> asyncio.Task:
+    async def medir():
+        inicio = time.monotonic()
+        resultado = await fazer()
+        duracao = time.monotonic() - inicio
+        estado.latencias.append(duracao)
+        if original:
+            estado.sem_hedge.append(duracao)
+        return resultado
+
+    return asyncio.get_running_loop().create_task(medir())
+
+
+def _deixar_terminar(tarefa: asyncio.Task):
+    """A perdedora termina sozinha (a requisição já foi enviada) só para medição"""
+    _em_voo.add(tarefa)
+    tarefa.add_done_callback(_em_voo.discard)
+    tarefa.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+async def executar(loja: str, fazer: Callable[[], Awaitable[T]]) -> T:
+    """Roda fazer() para a loja, com hedge após o p95 quando permitido"""
+    estado = _loja(loja)
+    estado.chamadas += 1
+    inicio = time.monotonic()
+    egress.PAR_HEDGE.set({})
+    original = _disparar(estado, fazer, original=True)
+    hedge = None
+    try:
+        limiar = estado.limiar() if Config.HEDGE else None
+        if limiar is not None:
+            prontas, _ = await asyncio.wait({original}, timeout=limiar)
+            if not prontas and estado.pode_hedge() and egress.tem_orcamento(loja):
+                hedge = _disparar(estado, fazer, original=False)
+                estado.hedges += 1
+                logger.debug(
+                    "🏇 Hedge em %s após %.0fms", loja, limiar * 1000,
+                    extra={"loja": loja, "latencia_ms": round(limiar * 1000, 1)},
+                )
+        estado.decisoes.append(hedge is not None)
+
+        if hedge is None:
+            resultado = await original
+        else:
+            prontas, _ = await asyncio.wait({original, hedge}, return_when=asyncio.FIRST_COMPLETED)
+            vencedora = original if original in prontas else hedge
+            perdedora = hedge if vencedora is original else original
+            if vencedora is hedge:
+                estado.vitorias += 1
+            _deixar_terminar(perdedora)
+            resultado = vencedora.result()
+    except asyncio.CancelledError:
+        # Prazo do ciclo: nenhuma das duas continua
+        for tarefa in (original, hedge):
+            if tarefa is not None:
+                tarefa.cancel()
+        raise
+
+    estado.efetivas.append(time.monotonic() - inicio)
+    return resultado
+
+
+def get_status() -> dict:
+    status = {}
+    for nome, estado in list(_lojas.items()):
+        limiar = estado.limiar()
+        status[nome] = {
+            "chamadas": estado.chamadas,
+            "hedges": estado.hedges,
+            "taxa_hedge_pct": round(estado.hedges / estado.chamadas * 100, 1) if estado.chamadas else 0.0,
+            "hedges_vencedores": estado.vitorias,
+            "limiar_ms": round(limiar * 1000) if limiar is not None else None,
+            "p99_efetivo_ms": round(_percentil(estado.efetivas, 99) * 1000) if estado.efetivas else None,
+            "p99_sem_hedge_ms": round(_percentil(estado.sem_hedge, 99) * 1000) if estado.sem_hedge else None,
+        }
+    return status
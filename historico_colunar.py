@@ -0,0 +1,363 @@
+"""
+📊 Histórico Colunar — Eventos de preço em colunas NumPy no disco
+   Cada mudança de preço registrada pelo price_db vira uma linha em
+   colunas binárias separadas, só com append:
+
+     anuncio.bin  int32    código do anúncio (linha N de anuncios.txt)
+     loja.bin     uint8    índice em meta.json["lojas"]
+     categoria.bin uint8   índice em meta.json["categorias"]
+     preco.bin    float64
+     ts.bin       float64  epoch (início do run)
+
+   As linhas ficam num buffer em memória e vão para o disco de uma vez,
+   junto com a gravação do price_db (uma vez por ciclo, numa thread).
+
+   A leitura usa np.memmap (sem copiar nem criar objetos Python), então
+   agregações por categoria sobre milhões de linhas levam milissegundos.
+
+   Só um processo escreve: quem abre as colunas para escrita segura um
+   flock em escrita.lock. O exportar pela linha de comando se recusa a
+   rodar com o bot escrevendo e monta as colunas numa pasta temporária,
+   trocando os arquivos com os.replace no fim.
+
+   Uso:
+     python historico_colunar.py exportar        # recria a partir do price_history.json
+     python historico_colunar.py resumo --por loja --desde-dias 7
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+from config import Config
+
+logger = logging.getLogger("HistoricoColunar")
+
+COLUNAS = {
+    "anuncio": np.dtype("<i4"),
+    "loja": np.dtype("u1"),
+    "categoria": np.dtype("u1"),
+    "preco": np.dtype("<f8"),
+    "ts": np.dtype("<f8"),
+}
+
+_meta: Optional[dict] = None
+_codigos: Dict[str, int] = {}
+# Eventos ainda não gravados: (anuncio_id, loja, categoria, preco, ts)
+_pendentes: List[tuple] = []
+# Arquivo aberto com o flock de escrita (None = ainda não travado)
+_trava = None
+
+ARQUIVOS = [f"{c}.bin" for c in COLUNAS] + ["anuncios.txt", "meta.json"]
+
+
+def _caminho(nome: str, diretorio: Optional[str] = None) -> str:
+    return os.path.join(diretorio or Config.HISTORICO_COLUNAR_DIR, nome)
+
+
+def _salvar_meta(meta: dict, diretorio: Optional[str] = None):
+    with open(_caminho("meta.json", diretorio), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+
+def _codigo(lista: List[str], valor: str) -> int:
+    """Índice do valor no dicionário (acrescenta na lista se novo)"""
+    try:
+        return lista.index(valor)
+    except ValueError:
+        if len(lista) >= 255:
+            raise ValueError(f"dicionário cheio ao acrescentar {valor!r}")
+        lista.append(valor)
+        return len(lista) - 1
+
+
+def _travar() -> bool:
+    """Flock de escrita na pasta; False se outro processo já escreve nela"""
+    global _trava
+    if _trava is not None:
+        return True
+    os.makedirs(Config.HISTORICO_COLUNAR_DIR, exist_ok=True)
+    arquivo = open(_caminho("escrita.lock"), "w")
+    if fcntl is not None:
+        try:
+            fcntl.flock(arquivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            arquivo.close()
+            return False
+    _trava = arquivo
+    return True
+
+
+def _abrir_escrita() -> bool:
+    """Carrega meta e dicionário de anúncios; False se o diretório não existe"""
+    global _meta
+    if _meta is not None:
+        return True
+    if not os.path.exists(_caminho("meta.json")):
+        return False
+    with open(_caminho("meta.json"), "r", encoding="utf-8") as f:
+        _meta = json.load(f)
+    with open(_caminho("anuncios.txt"), "r", encoding="utf-8") as f:
+        for i, linha in enumerate(f):
+            _codigos[linha.rstrip("\n")] = i
+    _alinhar()
+    return True
+
+
+def _alinhar():
+    """Corta as colunas no menor comprimento (append interrompido no meio)"""
+    linhas = min(os.path.getsize(_caminho(f"{c}.bin")) // t.itemsize for c, t in COLUNAS.items())
+    for coluna, tipo in COLUNAS.items():
+        caminho = _caminho(f"{coluna}.bin")
+        if os.path.getsize(caminho) != linhas * tipo.itemsize:
+            logger.warning(f"📊 Coluna {coluna} com linha incompleta — cortando em {linhas}")
+            os.truncate(caminho, linhas * tipo.itemsize)
+
+
+def _anexar_linhas(linhas: List[tuple]):
+    """
+    linhas: (anuncio_id, loja, categoria, preco, ts)
+
+    Os códigos novos só entram em _codigos/_meta depois que tudo foi
+    gravado; se algo falhar, os arquivos voltam ao tamanho de antes.
+    """
+    novos: Dict[str, int] = {}
+    for anuncio_id, *_ in linhas:
+        if anuncio_id not in _codigos and anuncio_id not in novos:
+            novos[anuncio_id] = len(_codigos) + len(novos)
+    lojas, categorias = list(_meta["lojas"]), list(_meta["categorias"])
+
+    valores = {
+        "anuncio": [_codigos.get(a, novos.get(a)) for a, _, _, _, _ in linhas],
+        "loja": [_codigo(lojas, loja) for _, loja, _, _, _ in linhas],
+        "categoria": [_codigo(categorias, cat) for _, _, cat, _, _ in linhas],
+        "preco": [preco for _, _, _, preco, _ in linhas],
+        "ts": [ts for _, _, _, _, ts in linhas],
+    }
+    meta = {**_meta, "lojas": lojas, "categorias": categorias}
+    meta_mudou = lojas != _meta["lojas"] or categorias != _meta["categorias"]
+
+    tamanhos = {nome: os.path.getsize(_caminho(nome)) for nome in ARQUIVOS[:-1]}
+    try:
+        if novos:
+            with open(_caminho("anuncios.txt"), "a", encoding="utf-8") as f:
+                f.writelines(f"{a}\n" for a in novos)
+        # meta.json antes das colunas: quem lê nunca vê um código sem nome
+        if meta_mudou:
+            _salvar_meta(meta)
+        for coluna, tipo in COLUNAS.items():
+            with open(_caminho(f"{coluna}.bin"), "ab") as f:
+                f.write(np.asarray(valores[coluna], dtype=tipo).tobytes())
+    except Exception:
+        for nome, tamanho in tamanhos.items():
+            try:
+                os.truncate(_caminho(nome), tamanho)
+            except OSError:
+                pass
+        if meta_mudou:
+            try:
+                _salvar_meta(_meta)
+            except OSError:
+                pass
+        raise
+
+    _codigos.update(novos)
+    _meta["lojas"], _meta["categorias"] = lojas, categorias
+
+
+def exportar(db: dict) -> int:
+    """
+    Recria as colunas a partir do price_db (um run = uma linha). Monta tudo
+    numa pasta temporária e troca os arquivos no fim; exige o flock de
+    escrita (_travar).
+    """
+    global _meta
+    linhas = sorted(
+        (
+            (anuncio_id, entrada.get("loja", "?"), entrada.get("categoria", "?"), run["preco"], run["inicio"])
+            for anuncio_id, entrada in db.items()
+            for run in entrada.get("historico", [])
+        ),
+        key=lambda l: l[4],
+    )
+    codigos = {a: i for i, a in enumerate(dict.fromkeys(l[0] for l in linhas))}
+    lojas: List[str] = []
+    categorias: List[str] = []
+    valores = {
+        "anuncio": [codigos[a] for a, _, _, _, _ in linhas],
+        "loja": [_codigo(lojas, loja) for _, loja, _, _, _ in linhas],
+        "categoria": [_codigo(categorias, cat) for _, _, cat, _, _ in linhas],
+        "preco": [preco for _, _, _, preco, _ in linhas],
+        "ts": [ts for _, _, _, _, ts in linhas],
+    }
+    meta = {"versao": 1, "colunas": {c: t.str for c, t in COLUNAS.items()}, "lojas": lojas, "categorias": categorias}
+
+    temporaria = _caminho(".exportando")
+    shutil.rmtree(temporaria, ignore_errors=True)
+    os.makedirs(temporaria)
+    for coluna, tipo in COLUNAS.items():
+        with open(_caminho(f"{coluna}.bin", temporaria), "wb") as f:
+            f.write(np.asarray(valores[coluna], dtype=tipo).tobytes())
+    with open(_caminho("anuncios.txt", temporaria), "w", encoding="utf-8") as f:
+        f.writelines(f"{a}\n" for a in codigos)
+    _salvar_meta(meta, temporaria)
+
+    # Cada arquivo é trocado inteiro; se a exportação falhar antes daqui,
+    # as colunas antigas ficam intactas
+    for nome in ARQUIVOS:
+        os.replace(_caminho(nome, temporaria), _caminho(nome))
+    os.rmdir(temporaria)
+
+    _meta = meta
+    _codigos.clear()
+    _codigos.update(codigos)
+    return len(linhas)
+
+
+def inicializar(db: dict):
+    """Abre as colunas; na primeira vez, exporta o histórico que já existe"""
+    if not Config.HISTORICO_COLUNAR:
+        return
+    try:
+        if not _travar():
+            logger.error(f"📊 Outro processo já escreve em {Config.HISTORICO_COLUNAR_DIR}/ — histórico colunar desligado")
+            return
+        if not _abrir_escrita():
+            total = exportar(db)
+            logger.info(f"📊 Histórico colunar criado com {total} eventos")
+    except Exception as e:
+        logger.error(f"Erro ao abrir histórico colunar: {e}")
+
+
+def anexar(anuncio_id: str, loja: str, categoria: str, preco: float, ts: float):
+    """Guarda um evento de mudança de preço para o próximo gravar()"""
+    if not Config.HISTORICO_COLUNAR or _meta is None:
+        return
+    _pendentes.append((anuncio_id, loja, categoria, preco, ts))
+
+
+def retirar() -> List[tuple]:
+    """Esvazia o buffer (no loop) e devolve os eventos para gravar()"""
+    global _pendentes
+    linhas, _pendentes = _pendentes, []
+    return linhas
+
+
+def gravar(linhas: List[tuple]) -> bool:
+    """Acrescenta os eventos às colunas (pode rodar numa thread)"""
+    if not linhas:
+        return True
+    try:
+        _anexar_linhas(linhas)
+        return True
+    except Exception as e:
+        logger.error(f"Erro ao anexar no histórico colunar: {e}")
+        return False
+
+
+# ── LEITURA ──
+
+class Colunas:
+    """Colunas mapeadas em memória (somente leitura) + dicionários"""
+
+    def __init__(self, diretorio: Optional[str] = None):
+        with open(_caminho("meta.json", diretorio), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.lojas: List[str] = meta["lojas"]
+        self.categorias: List[str] = meta["categorias"]
+        tipos = {c: np.dtype(t) for c, t in meta["colunas"].items()}
+        tamanhos = {c: os.path.getsize(_caminho(f"{c}.bin", diretorio)) // t.itemsize for c, t in tipos.items()}
+        self.linhas = min(tamanhos.values())
+        for coluna, tipo in tipos.items():
+            if self.linhas == 0:
+                valores = np.empty(0, dtype=tipo)
+            else:
+                valores = np.memmap(_caminho(f"{coluna}.bin", diretorio), dtype=tipo, mode="r", shape=(self.linhas,))
+            setattr(self, coluna, valores)
+        self._diretorio = diretorio
+
+    def anuncios(self) -> List[str]:
+        with open(_caminho("anuncios.txt", self._diretorio), "r", encoding="utf-8") as f:
+            return [linha.rstrip("\n") for linha in f]
+
+    def __len__(self) -> int:
+        return self.linhas
+
+
+def agregar(colunas: Colunas, por: str = "categoria", desde: Optional[float] = None) -> Dict[str, dict]:
+    """
+    Estatísticas de preço por categoria (ou loja): eventos, anúncios
+    distintos, mínimo, mediana e média. desde filtra por ts (epoch).
+    """
+    grupo = getattr(colunas, por)
+    nomes = colunas.categorias if por == "categoria" else colunas.lojas
+    filtro = colunas.ts >= desde if desde is not None else None
+
+    resultado = {}
+    for codigo, nome in enumerate(nomes):
+        mascara = grupo == codigo
+        if filtro is not None:
+            mascara &= filtro
+        precos = colunas.preco[mascara]
+        if not len(precos):
+            continue
+        resultado[nome] = {
+            "eventos": int(len(precos)),
+            "anuncios": int(np.count_nonzero(np.bincount(colunas.anuncio[mascara]))),
+            "minimo": float(precos.min()),
+            "mediana": float(np.median(precos)),
+            "media": float(precos.mean()),
+        }
+    return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Histórico de preços em colunas")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    sub.add_parser("exportar", help="recria as colunas a partir do price_history.json")
+    resumo = sub.add_parser("resumo", help="agregação por categoria ou loja")
+    resumo.add_argument("--por", choices=("categoria", "loja"), default="categoria")
+    resumo.add_argument("--desde-dias", type=float, help="só eventos dos últimos N dias")
+    args = parser.parse_args(argv)
+
+    if args.comando == "exportar":
+        # O price_db importa este arquivo como historico_colunar, não __main__:
+        # trava e estado têm que ser os daquele módulo
+        import historico_colunar
+        import price_db
+        if not historico_colunar._travar():
+            print(f"❌ O bot está gravando em {Config.HISTORICO_COLUNAR_DIR}/ — pare o bot antes de exportar")
+            return 1
+        inicio = time.perf_counter()
+        total = historico_colunar.exportar(price_db._load())
+        print(f"💾 {total} eventos exportados para {Config.HISTORICO_COLUNAR_DIR}/ "
+              f"({(time.perf_counter() - inicio) * 1000:.0f}ms)")
+        return
+
+    inicio = time.perf_counter()
+    colunas = Colunas()
+    desde = time.time() - args.desde_dias * 86400 if args.desde_dias else None
+    resultado = agregar(colunas, por=args.por, desde=desde)
+    duracao = (time.perf_counter() - inicio) * 1000
+
+    print(f"📊 {len(colunas)} eventos — agregação por {args.por} em {duracao:.0f}ms\n")
+    print(f"{args.por:<16} {'eventos':>9} {'anúncios':>9} {'mínimo':>10} {'mediana':>10} {'média':>10}")
+    for nome, r in sorted(resultado.items()):
+        print(f"{nome:<16} {r['eventos']:>9} {r['anuncios']:>9} {r['minimo']:>10.2f} "
+              f"{r['mediana']:>10.2f} {r['media']:>10.2f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,18 +2,52 @@
 🌐 Keep-Alive Server — Mantém o bot acordado no Render (free tier)
    O Render free hiberna serviços sem requisições HTTP.
    Este servidor responde pings e mantém tudo vivo.
+
+   As rotas de status leem estado que o event loop do bot altera; o Flask
+   roda em outra thread, então a leitura é feita no próprio loop
+   (_no_loop) e só o resultado volta para cá.
 """
 
+import asyncio
+import concurrent.futures
 import threading
 import logging
 from flask import Flask, jsonify
 from datetime import datetime
+from typing import Optional
+
 from config import Config
 
 logger = logging.getLogger("KeepAlive")
 app = Flask(__name__)
 
 _start_time = datetime.now()
+# Loop do bot — registrado pelo bot.py no post_init
+_loop: Optional[asyncio.AbstractEventLoop] = None
+# Espera máxima pelo loop (segundos) antes de responder 503
+ESPERA_LOOP = 5.0
+
+
+def registrar_loop(loop: asyncio.AbstractEventLoop):
+    global _loop
+    _loop = loop
+
+
+def _no_loop(funcao, *args, **kwargs):
+    """Chama funcao dentro do event loop do bot e devolve o resultado"""
+    if _loop is None or not _loop.is_running():
+        # Bot ainda não subiu (ou já parou): ninguém está alterando o estado
+        return funcao(*args, **kwargs)
+
+    async def coletar():
+        return funcao(*args, **kwargs)
+
+    return asyncio.run_coroutine_threadsafe(coletar(), _loop).result(timeout=ESPERA_LOOP)
+
+
+@app.errorhandler(concurrent.futures.TimeoutError)
+def loop_ocupado(_erro):
+    return jsonify({"erro": f"event loop não respondeu em {ESPERA_LOOP:.0f}s"}), 503
 
 
 @app.route("/")
@@ -32,6 +66,50 @@ def health():
     return jsonify({"status": "ok", "timestamp": datetime.now().isoformat()})
 
 
+def _metricas() -> dict:
+    import hedge
+    from monitor import get_status
+    status = get_status()
+    return {
+        "ciclos": {
+            "executados": status["cycles"],
+            "em_andamento": status["ciclo_em_andamento"],
+            "estourados": status["ciclos_estourados"],
+            "pulados": status["ciclos_pulados"],
+            "ultimo_segundos": status["ultimo_ciclo_segundos"],
+            "cursor": status["cursor"],
+        },
+        "erros_total": status["erros_total"],
+        "hedge": hedge.get_status(),
+    }
+
+
+@app.route("/metricas")
+def metricas():
+    return jsonify(_no_loop(_metricas))
+
+
+@app.route("/loop")
+def loop():
+    import loop_watchdog
+    return jsonify(_no_loop(loop_watchdog.get_status, top=10))
+
+
+@app.route("/memoria")
+def memoria_status():
+    import memoria
+    status = _no_loop(memoria.get_status, top=0)
+    # O snapshot do tracemalloc é o trecho caro e não lê os caches: fica aqui
+    status["top_alocacoes"] = memoria.top_alocacoes(15)
+    return jsonify(status)
+
+
+@app.route("/egress")
+def egress_status():
+    import egress
+    return jsonify(_no_loop(egress.get_status))
+
+
 @app.route("/ping")
 def ping():
     return "pong", 200
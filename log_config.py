@@ -0,0 +1,83 @@
+"""
+📝 Logging — Configuração não bloqueante e estruturada
+   O logger raiz só enfileira o registro (QueueHandler); um listener em
+   thread própria formata e escreve. Assim a escrita no stdout nunca
+   segura o event loop, e a mensagem (%-style) só é montada lá.
+
+   Por padrão (LOG_FORMATO=json) cada registro é um objeto JSON por linha
+   com os campos extras (loja, keyword, latencia_ms, desconto...) passados
+   via extra={...}. LOG_FORMATO=texto volta ao formato legível.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime
+
+from config import Config
+
+# Campos extras que viram chaves no JSON quando presentes no registro
+CAMPOS = (
+    "loja", "keyword", "categoria", "latencia_ms", "desconto", "preco",
+    "status", "itens", "ciclo", "alertas",
+)
+
+_listener = None
+
+
+class FormatadorJSON(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        dados = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for campo in CAMPOS:
+            valor = getattr(record, campo, None)
+            if valor is not None:
+                dados[campo] = valor
+        if record.exc_info:
+            dados["exc"] = self.formatException(record.exc_info)
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+class _QueueHandlerLazy(logging.handlers.QueueHandler):
+    """
+    QueueHandler que não formata no thread de quem loga.
+    Os args do hot path são valores imutáveis, então é seguro adiar o
+    record.getMessage() para o listener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configurar_logging():
+    """Instala QueueHandler no logger raiz e sobe o listener em background"""
+    global _listener
+    if _listener is not None:
+        return
+
+    saida = logging.StreamHandler(sys.stdout)
+    if Config.LOG_FORMATO == "texto":
+        saida.setFormatter(logging.Formatter(
+            "%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+            datefmt="%d/%m %H:%M:%S",
+        ))
+    else:
+        saida.setFormatter(FormatadorJSON())
+
+    fila: queue.SimpleQueue = queue.SimpleQueue()
+    raiz = logging.getLogger()
+    for handler in list(raiz.handlers):
+        raiz.removeHandler(handler)
+    raiz.addHandler(_QueueHandlerLazy(fila))
+    raiz.setLevel(Config.LOG_NIVEL)
+
+    _listener = logging.handlers.QueueListener(fila, saida, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
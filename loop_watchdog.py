@@ -0,0 +1,144 @@
+"""
+🐢 Loop Watchdog — Mede quanto o event loop fica travado
+   Tudo (polling do Telegram, job_monitor, scrapers, parsing de HTML e o
+   price_db) divide um único loop asyncio. Este módulo:
+
+   • mede o atraso de agendamento (lag) continuamente com um sleep curto
+   • cronometra cada callback do loop e registra os que passam do limiar,
+     com a corrotina responsável e onde ela suspendeu (a cadeia de awaits
+     só é percorrida para os lentos — o caminho comum é só um perf_counter)
+
+   Exposto no /status do bot e em /loop do servidor keep-alive.
+"""
+
+import asyncio
+import logging
+import os
+import sysconfig
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from config import Config
+
+logger = logging.getLogger("LoopWatchdog")
+
+_lags: deque = deque(maxlen=600)
+_lentos: deque = deque(maxlen=50)
+# local → [ocorrências, total_ms, max_ms]
+_por_local: Dict[str, List[float]] = {}
+_tarefa: Optional[asyncio.Task] = None
+
+# Frames da stdlib e de bibliotecas não dizem qual código do bot travou
+_FORA_DO_BOT = tuple(
+    {sysconfig.get_paths()[k] for k in ("stdlib", "platstdlib", "purelib", "platlib")}
+)
+
+
+def _frame_interno(coro):
+    """Frame mais interno do bot na cadeia de awaits de uma corrotina"""
+    frame = None
+    while coro is not None:
+        f = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if f is None:
+            break
+        if not f.f_code.co_filename.startswith(_FORA_DO_BOT):
+            frame = f
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return frame
+
+
+def _onde(frame, linha: Optional[int] = None) -> str:
+    if frame is None:
+        return "?"
+    return f"{os.path.basename(frame.f_code.co_filename)}:{linha or frame.f_lineno}"
+
+
+def _descrever(callback) -> str:
+    tarefa = getattr(callback, "__self__", None)
+    if isinstance(tarefa, asyncio.Task):
+        coro = tarefa.get_coro()
+        frame = _frame_interno(coro)
+        if frame is not None:
+            return f"{frame.f_code.co_qualname} (suspendeu em {_onde(frame)})"
+        # A tarefa terminou dentro do próprio callback
+        callback = coro
+
+    codigo = getattr(callback, "__code__", None) or getattr(
+        getattr(callback, "__func__", None), "__code__", None
+    ) or getattr(callback, "cr_code", None)
+    nome = getattr(callback, "__qualname__", repr(callback))
+    if codigo is not None:
+        return f"{nome} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})"
+    return nome
+
+
+def _registrar_lento(local: str, ms: float):
+    _lentos.append((time.strftime("%d/%m %H:%M:%S"), round(ms, 1), local))
+    agregado = _por_local.setdefault(local, [0, 0.0, 0.0])
+    agregado[0] += 1
+    agregado[1] += ms
+    agregado[2] = max(agregado[2], ms)
+    logger.warning(f"🐢 Loop travado {ms:.0f}ms em {local}")
+
+
+def _instrumentar_handles():
+    """Envolve Handle._run para cronometrar cada callback do loop"""
+    original = asyncio.events.Handle._run
+    if getattr(original, "_watchdog", False):
+        return
+
+    limiar = Config.LOOP_CALLBACK_LENTO_MS / 1000
+
+    def _run(self):
+        # cancel() durante o callback zera self._callback
+        callback = self._callback
+        inicio = time.perf_counter()
+        try:
+            return original(self)
+        finally:
+            duracao = time.perf_counter() - inicio
+            if duracao >= limiar:
+                _registrar_lento(_descrever(callback), duracao * 1000)
+
+    _run._watchdog = True
+    asyncio.events.Handle._run = _run
+
+
+async def _medir_lag():
+    intervalo = Config.LOOP_WATCHDOG_INTERVALO
+    while True:
+        inicio = time.perf_counter()
+        await asyncio.sleep(intervalo)
+        _lags.append(max((time.perf_counter() - inicio - intervalo) * 1000, 0.0))
+
+
+def iniciar():
+    """Liga o watchdog no loop atual (chamar de dentro do loop)"""
+    global _tarefa
+    if not Config.LOOP_WATCHDOG or _tarefa is not None:
+        return
+    _instrumentar_handles()
+    _tarefa = asyncio.get_running_loop().create_task(_medir_lag(), name="loop_watchdog")
+    logger.info(
+        f"🐢 Watchdog do loop ativo (callbacks ≥ {Config.LOOP_CALLBACK_LENTO_MS}ms são registrados)"
+    )
+
+
+def get_status(top: int = 5) -> dict:
+    lags = sorted(_lags)
+    p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))] if lags else 0.0
+    locais = sorted(_por_local.items(), key=lambda kv: kv[1][1], reverse=True)[:top]
+    return {
+        "lag_atual_ms": round(_lags[-1], 1) if _lags else 0.0,
+        "lag_p99_ms": round(p99, 1),
+        "lag_max_ms": round(lags[-1], 1) if lags else 0.0,
+        "callbacks_lentos": sum(int(v[0]) for v in _por_local.values()),
+        "top_locais": [
+            {"local": local, "vezes": int(n), "total_ms": round(total, 1), "max_ms": round(mx, 1)}
+            for local, (n, total, mx) in locais
+        ],
+        "recentes": [
+            {"quando": quando, "ms": ms, "local": local} for quando, ms, local in list(_lentos)[-10:]
+        ],
+    }
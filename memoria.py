@@ -0,0 +1,204 @@
+"""
+🧠 Memória — Orçamento de RAM para a instância de 512 MB do Render
+   O Render mata o processo sem aviso ao passar do limite. Este módulo:
+
+   • amostra o RSS (/proc) a cada ciclo e a cada MEMORIA_INTERVALO_SEGUNDOS
+   • com MEMORIA_TRACEMALLOC=1, lista os locais que mais alocam
+   • aplica o limite de itens de cada cache registrado (dedup, cache do
+     /buscar, price_db, estado estatístico) e, se o RSS passar de
+     MEMORIA_LIMITE_MB, reduz todos pela metade
+   • estima bytes por item de cada cache e projeta o pico com todos cheios
+
+   Cada módulo registra seu cache com registrar(), como no snapshot.
+   Exposto em /memoria do servidor keep-alive e no /status do bot.
+"""
+
+import asyncio
+import gc
+import logging
+import sys
+import time
+import tracemalloc
+from collections import deque
+from types import FunctionType, ModuleType
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from config import Config
+
+logger = logging.getLogger("Memoria")
+
+# Fração mantida de cada cache quando o RSS passa do limite
+FATOR_REDUCAO = 0.5
+# Intervalo mínimo entre reduções por pressão — o RSS demora a cair
+RESPIRO_SEGUNDOS = 300
+# Itens amostrados para estimar bytes por item
+AMOSTRA_ITENS = 50
+
+
+class _Cache(NamedTuple):
+    itens: Callable[[], int]
+    reduzir: Callable[[int], int]
+    amostra: Callable[[int], Iterable]
+    limite: int
+
+
+_caches: Dict[str, _Cache] = {}
+_amostras: deque = deque(maxlen=120)
+_ultima_reducao = 0.0
+_reducoes = 0
+_tarefa: Optional[asyncio.Task] = None
+
+
+def registrar(
+    nome: str,
+    itens: Callable[[], int],
+    reduzir: Callable[[int], int],
+    amostra: Callable[[int], Iterable],
+    limite: int,
+):
+    """
+    Registra um cache: itens() conta, reduzir(alvo) deixa no máximo alvo
+    itens (retorna quantos saíram) e amostra(k) devolve até k itens para
+    estimar o tamanho.
+    """
+    _caches[nome] = _Cache(itens, reduzir, amostra, limite)
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/status", "r") as f:
+            for linha in f:
+                if linha.startswith("VmRSS:"):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _tamanho_profundo(objetos: list) -> int:
+    """Bytes alcançáveis a partir dos objetos (compartilhados contam uma vez)"""
+    vistos = set()
+    total = 0
+    pendentes = list(objetos)
+    while pendentes:
+        obj = pendentes.pop()
+        if id(obj) in vistos or isinstance(obj, (type, ModuleType, FunctionType)):
+            continue
+        vistos.add(id(obj))
+        total += sys.getsizeof(obj)
+        pendentes.extend(gc.get_referents(obj))
+    return total
+
+
+def _reduzir(nome: str, cache: _Cache, alvo: int) -> int:
+    try:
+        removidos = cache.reduzir(max(alvo, 0))
+    except Exception as e:
+        logger.error(f"Erro ao reduzir cache '{nome}': {e}")
+        return 0
+    if removidos:
+        logger.info(f"🧠 Cache '{nome}' reduzido em {removidos} itens (alvo {alvo})")
+    return removidos
+
+
+def verificar():
+    """Aplica os limites de cada cache, reage ao RSS e guarda uma amostra"""
+    global _ultima_reducao, _reducoes
+    for nome, cache in _caches.items():
+        if cache.itens() > cache.limite:
+            _reduzir(nome, cache, cache.limite)
+
+    rss = rss_mb()
+    agora = time.monotonic()
+    if rss > Config.MEMORIA_LIMITE_MB and agora - _ultima_reducao >= RESPIRO_SEGUNDOS:
+        _ultima_reducao = agora
+        _reducoes += 1
+        logger.warning(
+            f"🧠 RSS {rss:.0f}MB acima de {Config.MEMORIA_LIMITE_MB}MB — reduzindo caches"
+        )
+        for nome, cache in _caches.items():
+            _reduzir(nome, cache, int(cache.itens() * FATOR_REDUCAO))
+        gc.collect()
+        rss = rss_mb()
+
+    traced = tracemalloc.get_traced_memory()[0] / 2**20 if tracemalloc.is_tracing() else None
+    _amostras.append((
+        time.strftime("%d/%m %H:%M:%S"),
+        round(rss, 1),
+        round(traced, 1) if traced is not None else None,
+        {nome: cache.itens() for nome, cache in _caches.items()},
+    ))
+
+
+async def _periodico():
+    while True:
+        await asyncio.sleep(Config.MEMORIA_INTERVALO_SEGUNDOS)
+        verificar()
+
+
+def iniciar():
+    """Liga o tracemalloc (se configurado) e a verificação periódica"""
+    global _tarefa
+    if _tarefa is not None:
+        return
+    if Config.MEMORIA_TRACEMALLOC and not tracemalloc.is_tracing():
+        tracemalloc.start(1)
+    _tarefa = asyncio.get_running_loop().create_task(_periodico(), name="memoria")
+    logger.info(f"🧠 Orçamento de memória: {Config.MEMORIA_LIMITE_MB}MB (RSS atual {rss_mb():.0f}MB)")
+
+
+def _projecao() -> dict:
+    """Bytes por item de cada cache e o pico previsto com todos no limite"""
+    caches = {}
+    ocupado = 0.0
+    projetado = 0.0
+    for nome, cache in _caches.items():
+        itens = cache.itens()
+        amostra = list(cache.amostra(AMOSTRA_ITENS))
+        por_item = _tamanho_profundo(amostra) / len(amostra) if amostra else 0.0
+        ocupado += itens * por_item
+        projetado += cache.limite * por_item
+        caches[nome] = {
+            "itens": itens,
+            "limite": cache.limite,
+            "bytes_por_item": round(por_item),
+            "atual_mb": round(itens * por_item / 2**20, 1),
+            "no_limite_mb": round(cache.limite * por_item / 2**20, 1),
+        }
+    rss = rss_mb()
+    base = max(rss - ocupado / 2**20, 0.0)
+    return {
+        "rss_mb": round(rss, 1),
+        "base_mb": round(base, 1),
+        "pico_previsto_mb": round(base + projetado / 2**20, 1),
+        "caches": caches,
+    }
+
+
+def top_alocacoes(top: int) -> List[dict]:
+    """Maiores alocações do tracemalloc — não toca nos caches, roda fora do loop"""
+    if not tracemalloc.is_tracing() or top <= 0:
+        return []
+    retrato = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ))
+    return [
+        {"local": f"{s.traceback[0].filename}:{s.traceback[0].lineno}",
+         "mb": round(s.size / 2**20, 2), "blocos": s.count}
+        for s in retrato.statistics("lineno")[:top]
+    ]
+
+
+def get_status(top: int = 10) -> dict:
+    return {
+        "limite_mb": Config.MEMORIA_LIMITE_MB,
+        "reducoes_por_pressao": _reducoes,
+        **_projecao(),
+        "top_alocacoes": top_alocacoes(top),
+        "amostras": [
+            {"quando": quando, "rss_mb": rss, "traced_mb": traced, "itens": itens}
+            for quando, rss, traced, itens in list(_amostras)[-20:]
+        ],
+    }
@@ -0,0 +1,38 @@
+"""
+📦 Models — Estruturas de dados compartilhadas
+   Produto normalizado que sai dos scrapers e passa por detector, monitor e price_db
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(frozen=True, slots=True)
+class Produto:
+    """
+    Produto já normalizado por um scraper.
+
+    id          → chave de deduplicação (anúncio + preço atual)
+    anuncio_id  → anúncio estável na loja, usado pelo histórico de preços
+    preco_original → preço riscado informado pela loja (0.0 = não informado)
+    """
+    id: str
+    anuncio_id: str
+    nome: str
+    preco: float
+    preco_original: float
+    desconto_pct: float
+    loja: str
+    link: str
+    keyword: str
+    seller: str = ""
+    disponivel: Optional[int] = None
+
+
+@dataclass(frozen=True, slots=True)
+class Alerta:
+    """Produto que o detector classificou como erro de preço"""
+    produto: Produto
+    categoria_key: str
+    motivo: str
+    desconto_pct: float
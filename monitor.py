@@ -4,13 +4,23 @@
 """
 
 import asyncio
+import html
 import logging
 import random
+import time
+from collections import OrderedDict
 from datetime import datetime
-from typing import List
+from typing import Awaitable, Callable, List, Optional, Tuple
 
+import egress
+import hedge
+import memoria
+import price_db
+import snapshot
 from config import Config
 from detector import analisar_produto
+from models import Alerta, Produto
+from scrapers import amazon, mercadolivre, shopee
 from scrapers.mercadolivre import scrape_mercadolivre
 from scrapers.amazon import scrape_amazon
 from scrapers.shopee import scrape_shopee
@@ -24,9 +34,25 @@ _state = {
     "ultimo_scan": "Nunca",
     "proximo_scan": "Aguardando...",
     "lojas": 3,
-    "seen_ids": set(),
+    # prod_id → None, do alerta mais antigo ao mais recente (a poda tira os antigos)
+    "seen_ids": OrderedDict(),
+    # Próxima (categoria, keyword) a escanear — None = ciclo completo
+    "cursor": None,
+    # Alertas do ciclo ainda não entregues (sobrevivem a um restart)
+    "pendentes": [],
+    # Métricas de orquestração dos ciclos
+    "ciclo_em_andamento": False,
+    "ciclos_estourados": 0,
+    "ciclos_pulados": 0,
+    "ultimo_ciclo_segundos": 0.0,
 }
 
+# Um ciclo por vez — evita corrida no price_history.json e no _state
+_ciclo_lock = asyncio.Lock()
+_ciclo_pendente = False
+# Snapshot restaurado com alertas pendentes ainda não reentregues
+_reentregar = False
+
 # ── KEYWORDS POR CATEGORIA ──
 CATEGORIAS = {
     "iphone": {
@@ -116,14 +142,86 @@ def get_status() -> dict:
     return {**_state, "proximo_scan": f"~{Config.SCAN_INTERVAL_MINUTES}min"}
 
 
-def formatar_alerta(produto: dict, categoria: dict, motivo: str, desconto_pct: float) -> str:
-    nome     = produto.get("nome", "Produto")[:80]
-    preco    = produto.get("preco", 0)
-    preco_original = produto.get("preco_original", 0)
-    loja     = produto.get("loja", "Loja")
-    link     = produto.get("link", "#")
+def _fila_keywords() -> List[Tuple[str, str]]:
+    """Todas as (categoria, keyword) na ordem de varredura"""
+    return [
+        (cat_key, keyword)
+        for cat_key, cat_info in CATEGORIAS.items()
+        for keyword in cat_info["keywords"]
+    ]
+
+
+def _posicao_cursor(fila: List[Tuple[str, str]]) -> int:
+    """Índice onde o ciclo anterior parou (0 se não houver ou se a lista mudou)"""
+    cursor = _state["cursor"]
+    if cursor is None:
+        return 0
+    try:
+        return fila.index(tuple(cursor))
+    except ValueError:
+        return 0
+
+
+def _exportar_snapshot() -> dict:
+    return {
+        "cycles": _state["cycles"],
+        "erros_total": _state["erros_total"],
+        "ultimo_scan": _state["ultimo_scan"],
+        "seen_ids": _state["seen_ids"],
+        "cursor": _state["cursor"],
+        "pendentes": _state["pendentes"],
+    }
+
+
+def _importar_snapshot(dados: dict):
+    global _reentregar
+    _state.update(dados)
+    if not isinstance(_state["seen_ids"], OrderedDict):
+        # Snapshot antigo (set): a ordem de chegada se perdeu
+        _state["seen_ids"] = OrderedDict.fromkeys(_state["seen_ids"])
+    # Pendentes que estavam no buffer do digest precisam ser entregues de novo
+    _reentregar = bool(_state["pendentes"])
+
+
+snapshot.registrar("monitor", _exportar_snapshot, _importar_snapshot)
+
+
+def confirmar_entrega(prod_id: str):
+    """Alerta entregue (ver entrega.py) — sai dos pendentes do snapshot"""
+    _state["pendentes"] = [a for a in _state["pendentes"] if a.produto.id != prod_id]
+
 
-    preco_fmt = f"R$ {preco:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+def _reduzir_vistos(alvo: int) -> int:
+    vistos = _state["seen_ids"]
+    excesso = len(vistos) - alvo
+    if excesso <= 0:
+        return 0
+    for _ in range(excesso):
+        vistos.popitem(last=False)
+    return excesso
+
+
+memoria.registrar(
+    "seen_ids",
+    lambda: len(_state["seen_ids"]),
+    _reduzir_vistos,
+    lambda k: list(_state["seen_ids"])[:k],
+    Config.MEMORIA_SEEN_IDS_MAX,
+)
+
+
+def formatar_preco(valor: float) -> str:
+    return f"R$ {valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def formatar_alerta(produto: Produto, categoria: dict, motivo: str, desconto_pct: float) -> str:
+    nome     = html.escape((produto.nome or "Produto")[:80])
+    preco    = produto.preco
+    preco_original = produto.preco_original
+    loja     = produto.loja or "Loja"
+    link     = html.escape(produto.link or "#", quote=True)
+
+    preco_fmt = formatar_preco(preco)
 
     if desconto_pct >= 70:
         urgencia = "🔴🔴🔴 ERRO ABSURDO"
@@ -134,7 +232,7 @@ def formatar_alerta(produto: dict, categoria: dict, motivo: str, desconto_pct: f
 
     linha_original = ""
     if preco_original and preco_original > preco:
-        orig_fmt = f"R$ {preco_original:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+        orig_fmt = formatar_preco(preco_original)
         linha_original = f"💰 <b>DE:</b> <s>{orig_fmt}</s>\n"
 
     return (
@@ -153,52 +251,207 @@ def formatar_alerta(produto: dict, categoria: dict, motivo: str, desconto_pct: f
     )
 
 
-async def run_all_monitors() -> List[str]:
-    _state["cycles"] += 1
-    _state["ultimo_scan"] = datetime.now().strftime("%d/%m %H:%M:%S")
+def formatar_digest(alertas: List[Alerta], top_n: int) -> str:
+    """Uma mensagem só para vários alertas do mesmo grupo (top N por desconto)"""
+    ordenados = sorted(alertas, key=lambda a: a.desconto_pct, reverse=True)
+    primeiro = ordenados[0]
+    # Sem "categoria" no DIGEST_CHAVES o grupo pode misturar categorias
+    categorias = [CATEGORIAS[k] for k in dict.fromkeys(a.categoria_key for a in ordenados)]
+    lojas = sorted({a.produto.loja for a in ordenados})
+
+    linhas = []
+    for i, alerta in enumerate(ordenados[:top_n], start=1):
+        produto = alerta.produto
+        linhas.append(
+            f"{i}. <b>{html.escape((produto.nome or 'Produto')[:60])}</b>\n"
+            f"   ✅ {formatar_preco(produto.preco)} ({alerta.desconto_pct:.0f}% OFF) — "
+            f"<a href='{html.escape(produto.link or '#', quote=True)}'>comprar</a>"
+        )
+    restantes = len(ordenados) - top_n
+    if restantes > 0:
+        linhas.append(f"➕ <i>mais {restantes} produto(s) no mesmo grupo</i>")
+
+    return (
+        f"📦 <b>{len(ordenados)} ERROS DE PREÇO</b> {''.join(c['emoji'] for c in categorias)}\n"
+        f"━━━━━━━━━━━━━━━━━━━━━━\n"
+        f"🏪 <b>Loja:</b> {', '.join(lojas)}\n"
+        f"📦 <b>Categoria:</b> {', '.join(c['nome'] for c in categorias)}\n"
+        f"🔝 <b>Maior desconto:</b> {primeiro.desconto_pct:.0f}% OFF\n\n"
+        + "\n\n".join(linhas)
+        + "\n━━━━━━━━━━━━━━━━━━━━━━\n"
+        "⚠️ <i>Erro pode ser corrigido a qualquer momento!</i>\n"
+        "💥 <i>@ErroDePrecoBot</i>"
+    )
+
+
+def _estourou(pos: int, total: int):
+    """Ciclo atingiu o prazo — o cursor fica na keyword não concluída"""
+    _state["ciclos_estourados"] += 1
+    snapshot.salvar()
+    logger.warning(
+        f"⏰ Prazo do ciclo {_state['cycles']} atingido em {pos + 1}/{total} — "
+        f"próximo ciclo continua daqui"
+    )
+
+
+async def executar_ciclo(
+    on_alerta: Optional[Callable[[Alerta], Awaitable[None]]] = None,
+) -> Optional[List[Alerta]]:
+    """
+    Roda um ciclo com prazo e proteção contra sobreposição.
+
+    Se já houver um ciclo rodando, pula (CICLO_SOBREPOSICAO=pular) ou
+    agenda uma nova rodada logo após o atual (enfileirar) e retorna None.
+    """
+    global _ciclo_pendente
+    if _ciclo_lock.locked():
+        _state["ciclos_pulados"] += 1
+        if Config.CICLO_SOBREPOSICAO == "enfileirar":
+            _ciclo_pendente = True
+            logger.warning("⏳ Ciclo anterior ainda rodando — nova rodada enfileirada")
+        else:
+            logger.warning("⏭️ Ciclo anterior ainda rodando — disparo pulado")
+        return None
+
     alertas = []
+    async with _ciclo_lock:
+        while True:
+            _ciclo_pendente = False
+            _state["ciclo_em_andamento"] = True
+            inicio = time.monotonic()
+            deadline = None
+            if Config.CICLO_DEADLINE_SEGUNDOS > 0:
+                deadline = inicio + Config.CICLO_DEADLINE_SEGUNDOS
+            try:
+                alertas += await run_all_monitors(on_alerta=on_alerta, deadline=deadline)
+            finally:
+                _state["ciclo_em_andamento"] = False
+                _state["ultimo_ciclo_segundos"] = round(time.monotonic() - inicio, 1)
+                # Runs novos do ciclo vão para o price_history.json de uma vez, fora do loop
+                await price_db.gravar()
+            if not _ciclo_pendente:
+                return alertas
 
-    for cat_key, cat_info in CATEGORIAS.items():
-        for keyword in cat_info["keywords"]:
-            logger.info(f"🔍 [{cat_info['nome']}] {keyword}")
 
-            tasks = [
-                scrape_mercadolivre(keyword, cat_info["preco_max"]),
-                scrape_amazon(keyword, cat_info["preco_max"]),
-                scrape_shopee(keyword, cat_info["preco_max"]),
-            ]
+async def run_all_monitors(
+    on_alerta: Optional[Callable[[Alerta], Awaitable[None]]] = None,
+    deadline: Optional[float] = None,
+) -> List[Alerta]:
+    """
+    Executa (ou retoma) um ciclo de varredura.
 
-            resultados = await asyncio.gather(*tasks, return_exceptions=True)
+    Com on_alerta, cada alerta é entregue assim que detectado e fica nos
+    pendentes até confirmar_entrega(); sem ele, os alertas são acumulados
+    e devolvidos no fim do ciclo.
 
-            for resultado in resultados:
-                if isinstance(resultado, Exception):
-                    logger.warning(f"Erro no scraper: {resultado}")
-                    continue
-                if not resultado:
+    deadline é um instante de time.monotonic(): ao atingi-lo o ciclo para,
+    e o cursor faz o próximo começar na keyword que não foi concluída.
+    """
+    fila = _fila_keywords()
+    inicio = _posicao_cursor(fila)
+    if inicio == 0:
+        _state["cycles"] += 1
+    else:
+        logger.info(
+            "♻️ Retomando ciclo %d em %d/%d", _state["cycles"], inicio + 1, len(fila),
+            extra={"ciclo": _state["cycles"]},
+        )
+    _state["ultimo_scan"] = datetime.now().strftime("%d/%m %H:%M:%S")
+    global _reentregar
+    alertas = _state["pendentes"] if on_alerta is None else []
+    novos = 0
+
+    # Alertas que ficaram sem entrega antes de um restart (os que ainda
+    # estão na fila de envio restaurada saem por lá)
+    if on_alerta is not None and _reentregar:
+        import entrega  # entrega → digest → monitor
+        _reentregar = False
+        for alerta in list(_state["pendentes"]):
+            if not entrega.na_fila(alerta.produto.id):
+                await on_alerta(alerta)
+
+    for pos in range(inicio, len(fila)):
+        cat_key, keyword = fila[pos]
+        cat_info = CATEGORIAS[cat_key]
+        _state["cursor"] = (cat_key, keyword)
+
+        restante = deadline - time.monotonic() if deadline is not None else None
+        if restante is not None and restante <= 0:
+            if on_alerta is None:
+                _state["pendentes"] = []
+            _estourou(pos, len(fila))
+            return alertas
+
+        logger.info(
+            "🔍 [%s] %s", cat_info["nome"], keyword,
+            extra={"categoria": cat_key, "keyword": keyword},
+        )
+
+        preco_max = cat_info["preco_max"]
+        tasks = [
+            hedge.executar(mercadolivre.LOJA, lambda: scrape_mercadolivre(keyword, preco_max)),
+            hedge.executar(amazon.LOJA, lambda: scrape_amazon(keyword, preco_max)),
+            hedge.executar(shopee.LOJA, lambda: scrape_shopee(keyword, preco_max)),
+        ]
+
+        try:
+            resultados = await asyncio.wait_for(
+                asyncio.gather(*tasks, return_exceptions=True), timeout=restante
+            )
+        except asyncio.TimeoutError:
+            if on_alerta is None:
+                _state["pendentes"] = []
+            _estourou(pos, len(fila))
+            return alertas
+
+        for resultado in resultados:
+            if isinstance(resultado, Exception):
+                logger.warning("Erro no scraper: %s", resultado, extra={"keyword": keyword})
+                continue
+            if not resultado:
+                continue
+
+            for produto in resultado:
+                prod_id = produto.id
+                if prod_id in _state["seen_ids"]:
                     continue
 
-                for produto in resultado:
-                    prod_id = produto.get("id", "")
-                    if prod_id in _state["seen_ids"]:
-                        continue
+                e_erro, motivo, desconto_pct = analisar_produto(produto, cat_key)
+                if not e_erro:
+                    continue
 
-                    e_erro, motivo, desconto_pct = analisar_produto(produto, cat_key)
-                    if not e_erro:
-                        continue
+                _state["seen_ids"][prod_id] = None
+                _state["erros_total"] += 1
+                novos += 1
+                alerta = Alerta(produto, cat_key, motivo, desconto_pct)
+                # Entra nos pendentes antes de seguir para o digest/fila de envio
+                # (sem on_alerta, alertas é a própria lista de pendentes)
+                _state["pendentes"].append(alerta)
+                if on_alerta is not None:
+                    await on_alerta(alerta)
+                logger.info(
+                    "💥 %s | %.0f%% OFF | R$%.2f | %s | %s",
+                    produto.nome[:40], desconto_pct, produto.preco, produto.loja, motivo,
+                    extra={
+                        "loja": produto.loja, "keyword": keyword, "categoria": cat_key,
+                        "desconto": round(desconto_pct, 1), "preco": produto.preco,
+                    },
+                )
 
-                    _state["seen_ids"].add(prod_id)
-                    _state["erros_total"] += 1
-                    alertas.append(formatar_alerta(produto, cat_info, motivo, desconto_pct))
-                    logger.info(
-                        f"💥 {produto.get('nome','?')[:40]} | "
-                        f"{desconto_pct:.0f}% OFF | "
-                        f"R${produto.get('preco',0):.2f} | {produto.get('loja')} | {motivo}"
-                    )
+        # Keyword concluída — um restart a partir daqui continua na próxima
+        _state["cursor"] = fila[pos + 1] if pos + 1 < len(fila) else None
+        snapshot.salvar_se_preciso()
 
-            await asyncio.sleep(Config.REQUEST_DELAY + random.uniform(0.5, 1.0))
+        # Com mais saídas saudáveis o ritmo sobe; o limite por IP fica nos buckets do egress
+        await asyncio.sleep((Config.REQUEST_DELAY + random.uniform(0.5, 1.0)) / egress.saudaveis())
 
-    if len(_state["seen_ids"]) > 2000:
-        _state["seen_ids"] = set(list(_state["seen_ids"])[-1000:])
+    memoria.verificar()
 
-    logger.info(f"✅ Ciclo {_state['cycles']} — {len(alertas)} alertas")
+    if on_alerta is None:
+        _state["pendentes"] = []
+    snapshot.salvar()
+    logger.info(
+        "✅ Ciclo %d — %d alertas", _state["cycles"], novos,
+        extra={"ciclo": _state["cycles"], "alertas": novos},
+    )
     return alertas
@@ -1,79 +1,247 @@
 """
 💾 Price DB — Banco de preços históricos (arquivo JSON local)
    Salva o histórico de preços por produto para detectar quedas bruscas
+
+   O histórico de cada anúncio é run-length: cada entrada é um período em
+   que o preço ficou igual — {preco, original, inicio, fim, n}. Um scan com
+   o mesmo preço só estende o run em memória. Preço novo (ou anúncio novo)
+   só marca o banco como alterado: o arquivo é regravado uma vez por ciclo,
+   em JSON compacto e numa thread, com gravar().
+
+   Cada run novo também vai para o histórico colunar (historico_colunar),
+   para análises sem carregar este JSON — gravado na mesma thread do gravar().
 """
 
+import asyncio
 import json
 import os
 import logging
+import threading
+import time
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
+
+import historico_colunar
+import memoria
+from config import Config
+from models import Produto
 
 logger = logging.getLogger("PriceDB")
 
 DB_FILE = "price_history.json"
 
+# Máximo de runs (mudanças de preço) guardados por anúncio
+MAX_RUNS = 60
 
-def _load() -> dict:
-    if not os.path.exists(DB_FILE):
-        return {}
-    try:
-        with open(DB_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {}
+# Cópia em memória do arquivo — evita reler o JSON a cada produto
+_cache: Optional[dict] = None
+# Houve mudança (run novo, anúncio novo, poda) ainda não gravada
+_sujo = False
+_gravacao = asyncio.Lock()
 
 
-def _save(db: dict):
+def _load() -> dict:
+    global _cache
+    if _cache is not None:
+        return _cache
+    _cache = {}
+    if os.path.exists(DB_FILE):
+        try:
+            with open(DB_FILE, "r", encoding="utf-8") as f:
+                _cache = json.load(f)
+        except Exception:
+            pass
+        for entrada in _cache.values():
+            entrada["historico"] = _migrar(entrada.get("historico", []))
+    # Mesmo sem arquivo (primeiro boot): sem isso o anexar() não grava nada
+    historico_colunar.inicializar(_cache)
+    return _cache
+
+
+def _migrar(historico: list) -> list:
+    """Converte amostras antigas ({preco, data}) em runs ({preco, inicio, fim, n})"""
+    if not historico or "n" in historico[0]:
+        return historico
+    runs: list = []
+    for h in historico:
+        try:
+            ts = datetime.strptime(h["data"], "%d/%m/%Y %H:%M").timestamp()
+        except (KeyError, ValueError):
+            ts = time.time()
+        if runs and runs[-1]["preco"] == h["preco"]:
+            runs[-1]["fim"] = ts
+            runs[-1]["n"] += 1
+        else:
+            runs.append({
+                "preco": h["preco"], "original": h.get("original", 0.0),
+                "inicio": ts, "fim": ts, "n": 1,
+            })
+    return runs[-MAX_RUNS:]
+
+
+def _json(valor) -> str:
+    return json.dumps(valor, ensure_ascii=False, separators=(",", ":"))
+
+
+def _save(db: dict) -> bool:
+    # Arquivo temporário por thread + rename: gravar() e salvar() nunca se misturam
+    tmp = f"{DB_FILE}.{threading.get_ident()}.tmp"
     try:
-        with open(DB_FILE, "w", encoding="utf-8") as f:
-            json.dump(db, f, ensure_ascii=False, indent=2)
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("{")
+            for i, (anuncio_id, entrada) in enumerate(db.items()):
+                # Um dumps por anúncio: usa o encoder em C e, numa thread,
+                # solta o GIL entre um anúncio e outro (o loop não trava)
+                f.write(("," if i else "") + _json(anuncio_id) + ":" + _json(entrada))
+            f.write("}")
+        os.replace(tmp, DB_FILE)
+        return True
     except Exception as e:
         logger.error(f"Erro ao salvar price_db: {e}")
-
-
-def get_historico(prod_id: str) -> list:
-    """Retorna histórico de preços de um produto"""
+        return False
+
+
+def _copia(db: dict) -> dict:
+    """
+    Cópia para serializar fora do loop. Só o último run de cada anúncio
+    muda no lugar (fim/n/original); os anteriores são compartilhados.
+    """
+    return {
+        anuncio_id: {**entrada, "historico": entrada["historico"][:-1] + [dict(r) for r in entrada["historico"][-1:]]}
+        for anuncio_id, entrada in db.items()
+    }
+
+
+def _gravar(db: dict, linhas: list) -> bool:
+    # Colunas primeiro: falha no JSON não faz os eventos serem gravados de novo
+    historico_colunar.gravar(linhas)
+    return _save(db)
+
+
+async def gravar():
+    """Grava o arquivo numa thread se algo mudou desde a última gravação"""
+    global _sujo
+    async with _gravacao:
+        if _cache is None or not _sujo:
+            return
+        _sujo = False
+        linhas = historico_colunar.retirar()
+        if not await asyncio.to_thread(_gravar, _copia(_cache), linhas):
+            _sujo = True
+
+
+def podar(alvo: int) -> int:
+    """
+    Mantém só os alvo anúncios vistos mais recentemente (o arquivo acompanha
+    no próximo gravar()).
+    Os eventos removidos continuam no histórico colunar.
+    """
+    if _cache is None or len(_cache) <= alvo:
+        return 0
+    por_recencia = sorted(
+        _cache, key=lambda a: _cache[a]["historico"][-1]["fim"] if _cache[a]["historico"] else 0.0
+    )
+    global _sujo
+    removidos = por_recencia[:len(_cache) - alvo]
+    for anuncio_id in removidos:
+        del _cache[anuncio_id]
+    _sujo = True
+    return len(removidos)
+
+
+memoria.registrar(
+    "price_db",
+    lambda: len(_cache) if _cache is not None else 0,
+    podar,
+    lambda k: list(_cache.items())[:k] if _cache is not None else [],
+    Config.MEMORIA_PRICE_DB_MAX_ANUNCIOS,
+)
+
+
+def salvar():
+    """Grava o estado em memória (fim/n dos runs abertos) no arquivo, na hora"""
+    global _sujo
+    if _cache is not None and _gravar(_cache, historico_colunar.retirar()):
+        _sujo = False
+
+
+def duracao_run(run: dict) -> float:
+    """
+    Peso de um run em segundos: o período observado mais um intervalo de
+    scan (um run de uma amostra só ainda representa um scan inteiro)
+    """
+    return run["fim"] - run["inicio"] + Config.SCAN_INTERVAL_MINUTES * 60
+
+
+def get_historico(anuncio_id: str) -> List[dict]:
+    """Retorna os runs de preço de um anúncio (mais antigo primeiro)"""
     db = _load()
-    return db.get(prod_id, {}).get("historico", [])
+    return db.get(anuncio_id, {}).get("historico", [])
 
 
-def get_preco_referencia(prod_id: str) -> Optional[float]:
-    """Retorna o preço de referência (mediana histórica) do produto"""
-    db = _load()
-    historico = db.get(prod_id, {}).get("historico", [])
+def get_preco_referencia(anuncio_id: str) -> Optional[float]:
+    """Retorna o preço de referência (mediana ponderada pela duração dos runs)"""
+    historico = get_historico(anuncio_id)
     if not historico:
         return None
-    precos = [h["preco"] for h in historico]
-    precos_sorted = sorted(precos)
-    n = len(precos_sorted)
-    # mediana
-    if n % 2 == 0:
-        return (precos_sorted[n // 2 - 1] + precos_sorted[n // 2]) / 2
-    return precos_sorted[n // 2]
-
-
-def registrar_preco(prod_id: str, nome: str, preco: float, loja: str):
-    """Registra o preço atual no histórico"""
+    runs = sorted(historico, key=lambda r: r["preco"])
+    pesos = [duracao_run(r) for r in runs]
+    metade = sum(pesos) / 2
+    acumulado = 0.0
+    for i, peso in enumerate(pesos):
+        acumulado += peso
+        if acumulado > metade:
+            return runs[i]["preco"]
+        if acumulado == metade and i + 1 < len(runs):
+            # Exatamente no meio: média com o próximo preço, como na mediana comum
+            return (runs[i]["preco"] + runs[i + 1]["preco"]) / 2
+    return runs[-1]["preco"]
+
+
+def registrar_preco(produto: Produto, categoria_key: str):
+    """
+    Registra o preço atual do anúncio. Mesmo preço do run atual só estende
+    o run em memória; preço diferente abre um run novo e marca o banco
+    para o próximo gravar().
+    """
+    global _sujo
     db = _load()
-    if prod_id not in db:
-        db[prod_id] = {"nome": nome, "historico": []}
+    agora = time.time()
+    if produto.anuncio_id not in db:
+        db[produto.anuncio_id] = {
+            "nome": produto.nome,
+            "loja": produto.loja,
+            "categoria": categoria_key,
+            "historico": [],
+        }
+
+    historico = db[produto.anuncio_id]["historico"]
+    if historico and historico[-1]["preco"] == produto.preco:
+        run = historico[-1]
+        run["fim"] = agora
+        run["n"] += 1
+        run["original"] = produto.preco_original
+        return
 
-    historico = db[prod_id]["historico"]
     historico.append({
-        "preco": preco,
-        "loja": loja,
-        "data": datetime.now().strftime("%d/%m/%Y %H:%M"),
+        "preco": produto.preco,
+        "original": produto.preco_original,
+        "inicio": agora,
+        "fim": agora,
+        "n": 1,
     })
-
-    # Manter apenas os últimos 60 registros por produto
-    db[prod_id]["historico"] = historico[-60:]
-    _save(db)
-
-
-def preco_minimo_historico(prod_id: str) -> Optional[float]:
-    """Retorna o menor preço já visto para este produto"""
-    historico = get_historico(prod_id)
-    if not historico:
-        return None
-    return min(h["preco"] for h in historico)
+    del historico[:-MAX_RUNS]
+    _sujo = True
+    entrada = db[produto.anuncio_id]
+    historico_colunar.anexar(produto.anuncio_id, entrada["loja"], entrada["categoria"], produto.preco, agora)
+
+
+def preco_minimo_historico(anuncio_id: str, duracao_minima: float = 0.0) -> Optional[float]:
+    """
+    Retorna o menor preço já visto para este anúncio, considerando só runs
+    que duraram pelo menos duracao_minima segundos (ignora blips)
+    """
+    precos = [
+        r["preco"] for r in get_historico(anuncio_id) if duracao_run(r) >= duracao_minima
+    ]
+    return min(precos) if precos else None
@@ -1,6 +1,10 @@
 """
 🛒 Scraper — Amazon Brasil
    Busca produtos com erro de preço via scraping HTML
+
+   A página de busca é lida em streaming: os pedaços vão para um parser
+   incremental do lxml conforme chegam, cada resultado é extraído assim
+   que fecha, e a conexão é encerrada quando já temos MAX_ITENS.
 """
 
 import asyncio
@@ -8,16 +12,47 @@ import hashlib
 import logging
 import random
 import re
+import time
 from typing import List, Optional
 
 import aiohttp
-from bs4 import BeautifulSoup
+from lxml import etree
 
+import egress
 from config import Config
+from models import Produto
 
 logger = logging.getLogger("Amazon-Scraper")
 
 AMAZON_SEARCH_URL = "https://www.amazon.com.br/s"
+LOJA = "Amazon Brasil"
+
+# Top N resultados lidos por busca — o resto da página nem é baixado
+MAX_ITENS = 10
+CHUNK_BYTES = 16 * 1024
+
+
+def _classe(nome: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {nome} ')"
+
+
+# Equivalentes XPath dos seletores CSS de cada resultado
+_XP_NOME = etree.XPath(".//h2//a//span")
+_XP_LINK = etree.XPath(".//h2//a")
+_XP_PRECO = etree.XPath(f".//*[{_classe('a-price')}]//*[{_classe('a-offscreen')}]")
+_XP_PRECO_ORIG = etree.XPath(
+    f".//*[{_classe('a-price')} and {_classe('a-text-price')}]//*[{_classe('a-offscreen')}]"
+)
+_XP_ECONOMIA = etree.XPath(f".//*[{_classe('savingsPercentage')}]")
+# Só "-65%" ou "65% off" contam como desconto — badges como "Top 10" não
+_RE_ECONOMIA = re.compile(r"-\s*(\d{1,3})\s*%|(\d{1,3})\s*%\s*off", re.IGNORECASE)
+
+
+def _texto(elementos: list) -> str:
+    """Texto do primeiro elemento, sem espaços nas bordas de cada trecho"""
+    if not elementos:
+        return ""
+    return "".join(t.strip() for t in elementos[0].itertext())
 
 
 def _preco_para_float(texto: str) -> float:
@@ -34,7 +69,7 @@ def _preco_para_float(texto: str) -> float:
         return 0.0
 
 
-async def scrape_amazon(keyword: str, preco_max: int) -> List[dict]:
+async def scrape_amazon(keyword: str, preco_max: int) -> List[Produto]:
     """
     Busca produtos na Amazon Brasil via scraping.
     Retorna lista de produtos que parecem erro de preço.
@@ -59,96 +94,123 @@ async def scrape_amazon(keyword: str, preco_max: int) -> List[dict]:
     }
 
     try:
+        inicio = time.perf_counter()
         async with aiohttp.ClientSession() as session:
-            async with session.get(
-                AMAZON_SEARCH_URL,
+            async with egress.requisicao(
+                session, LOJA, AMAZON_SEARCH_URL,
                 params=params,
                 headers=headers,
                 timeout=aiohttp.ClientTimeout(total=Config.REQUEST_TIMEOUT),
                 ssl=False,
             ) as resp:
                 if resp.status != 200:
-                    logger.warning(f"Amazon retornou {resp.status} para '{keyword}'")
+                    logger.warning(
+                        "Amazon retornou %d para '%s'", resp.status, keyword,
+                        extra={"loja": LOJA, "keyword": keyword, "status": resp.status},
+                    )
                     return []
 
-                html = await resp.text()
-                soup = BeautifulSoup(html, "html.parser")
-                items = soup.select('[data-component-type="s-search-result"]')
-
-                for item in items[:10]:  # top 10 resultados
-                    produto = _processar_item_amazon(item, keyword)
-                    if produto:
-                        produtos.append(produto)
+                parser = etree.HTMLPullParser(events=("end",), encoding=resp.charset or "utf-8")
+                itens = 0
+                recebidos = 0
+                async for chunk in resp.content.iter_chunked(CHUNK_BYTES):
+                    recebidos += len(chunk)
+                    parser.feed(chunk)
+                    for _, elemento in parser.read_events():
+                        if elemento.get("data-component-type") != "s-search-result":
+                            continue
+                        itens += 1
+                        produto = _processar_item_amazon(elemento, keyword)
+                        if produto:
+                            produtos.append(produto)
+                        # Resultado já lido: libera a subárvore e os irmãos anteriores
+                        elemento.clear()
+                        while elemento.getprevious() is not None:
+                            del elemento.getparent()[0]
+                        if itens >= MAX_ITENS:
+                            break
+                    if itens >= MAX_ITENS:
+                        # Fecha a conexão sem baixar o resto da página
+                        resp.close()
+                        break
+
+                latencia_ms = (time.perf_counter() - inicio) * 1000
+                logger.info(
+                    "Amazon: %d itens em %.0fms (%d KB lidos) para '%s'",
+                    itens, latencia_ms, recebidos // 1024, keyword,
+                    extra={"loja": LOJA, "keyword": keyword, "latencia_ms": round(latencia_ms, 1),
+                           "itens": itens, "status": resp.status},
+                )
 
     except asyncio.TimeoutError:
-        logger.warning(f"Timeout na Amazon para '{keyword}'")
+        logger.warning("Timeout na Amazon para '%s'", keyword, extra={"loja": LOJA, "keyword": keyword})
     except Exception as e:
-        logger.error(f"Erro Amazon scraper '{keyword}': {e}")
+        logger.error("Erro Amazon scraper '%s': %s", keyword, e, extra={"loja": LOJA, "keyword": keyword})
 
     return produtos
 
 
-def _processar_item_amazon(item, keyword: str) -> Optional[dict]:
+def _processar_item_amazon(item: etree._Element, keyword: str) -> Optional[Produto]:
     """Processa um item da Amazon e verifica se é erro de preço"""
     try:
         # Nome do produto
-        nome_el = item.select_one("h2 a span")
-        if not nome_el:
+        nome = _texto(_XP_NOME(item))
+        if not nome:
             return None
-        nome = nome_el.get_text(strip=True)
 
         # Link
-        link_el = item.select_one("h2 a")
+        link_els = _XP_LINK(item)
         link = ""
-        if link_el and link_el.get("href"):
-            href = link_el["href"]
+        if link_els and link_els[0].get("href"):
+            href = link_els[0].get("href")
             link = f"https://www.amazon.com.br{href}" if href.startswith("/") else href
 
         # Preço atual
-        preco_el = item.select_one(".a-price .a-offscreen")
-        if not preco_el:
+        preco_txt = _texto(_XP_PRECO(item))
+        if not preco_txt:
             return None
-        preco = _preco_para_float(preco_el.get_text(strip=True))
+        preco = _preco_para_float(preco_txt)
         if preco <= 0:
             return None
 
-        # Preço original (riscado)
-        preco_original = preco
-        preco_orig_el = item.select_one(".a-price.a-text-price .a-offscreen")
-        if preco_orig_el:
-            preco_original = _preco_para_float(preco_orig_el.get_text(strip=True))
+        # Preço original (riscado) — 0.0 quando a loja não mostra
+        preco_original = 0.0
+        preco_orig_txt = _texto(_XP_PRECO_ORIG(item))
+        if preco_orig_txt:
+            preco_original = _preco_para_float(preco_orig_txt)
 
-        # Desconto em badge (ex: "-65%")
-        badge_el = item.select_one(".a-badge-text, .savingsPercentage")
+        # Desconto informado pela loja (ex: "-65%")
         desconto_pct = 0.0
+        match = _RE_ECONOMIA.search(_texto(_XP_ECONOMIA(item)))
+        if match:
+            desconto_pct = float(match.group(1) or match.group(2))
 
-        if badge_el:
-            badge_txt = badge_el.get_text(strip=True)
-            match = re.search(r"(\d+)", badge_txt)
-            if match:
-                desconto_pct = float(match.group(1))
-
-        # Calcular desconto por preços se não veio em badge
+        # Calcular desconto por preços se não veio informado
         if desconto_pct == 0 and preco_original > preco:
             desconto_pct = ((preco_original - preco) / preco_original) * 100
 
         if desconto_pct <= 0:
             return None
 
+        # Sem preço riscado o preco_original fica 0.0: o percentual sozinho
+        # não vira um preço de lista para a CAMADA 1 do detector
+
         # ID único
         prod_id = hashlib.md5(f"amz_{link}_{preco}".encode()).hexdigest()
-
-        return {
-            "id": prod_id,
-            "nome": nome,
-            "preco": preco,
-            "preco_original": preco_original if preco_original > preco else preco * 1.5,
-            "desconto_pct": desconto_pct,
-            "loja": "Amazon Brasil",
-            "link": link,
-            "keyword": keyword,
-        }
+        asin = item.get("data-asin") or link
+
+        return Produto(
+            id=prod_id,
+            anuncio_id=f"amz_{asin}",
+            nome=nome,
+            preco=preco,
+            preco_original=preco_original,
+            desconto_pct=desconto_pct,
+            loja=LOJA,
+            link=link,
+            keyword=keyword,
+        )
 
     except Exception as e:
-        logger.debug(f"Erro ao processar item Amazon: {e}")
+        logger.debug("Erro ao processar item Amazon: %s", e)
         return None
@@ -1,23 +1,89 @@
 """
 🛒 Scraper — Mercado Livre
    Busca produtos com erro de preço via API pública do ML
+
+   A resposta é decodificada direto dos bytes para structs do msgspec com
+   só os campos que o normalizador lê; o resto do JSON é pulado sem virar
+   objeto Python. Cada item é validado sozinho e sem tipagem estrita: um
+   item fora do padrão é descartado sem derrubar a página.
 """
 
 import asyncio
 import hashlib
 import logging
 import random
+import time
 import aiohttp
-from typing import List, Optional
+import msgspec
+from typing import List, Optional, Union
 
+import egress
 from config import Config
+from models import Produto
 
 logger = logging.getLogger("ML-Scraper")
 
 ML_API_URL = "https://api.mercadolibre.com/sites/MLB/search"
+LOJA = "Mercado Livre"
+
+# Campos numéricos aceitam string/null; os demais aceitam qualquer escalar
+# (ex: available_quantity 1.0 ou "5") e o normalizador converte
+Numero = Union[float, str, None]
+Escalar = Union[int, float, str, None]
+
+
+class ValorML(msgspec.Struct):
+    number: Numero = None
+
+
+class AtributoML(msgspec.Struct):
+    id: Escalar = None
+    value_struct: Optional[ValorML] = None
+
+
+class VendedorML(msgspec.Struct):
+    nickname: Escalar = None
+
+
+class ItemML(msgspec.Struct):
+    id: Union[str, int, None] = None
+    title: Escalar = None
+    price: Numero = None
+    original_price: Numero = None
+    attributes: Optional[List[AtributoML]] = None
+    permalink: Escalar = None
+    seller: Optional[VendedorML] = None
+    available_quantity: Escalar = None
 
 
-async def scrape_mercadolivre(keyword: str, preco_max: int) -> List[dict]:
+class RespostaML(msgspec.Struct):
+    # Cada item fica em bytes até ser decodificado sozinho em decodificar()
+    results: Optional[List[msgspec.Raw]] = None
+
+
+_decoder = msgspec.json.Decoder(RespostaML, strict=False)
+_decoder_item = msgspec.json.Decoder(ItemML, strict=False)
+
+
+def decodificar(corpo: bytes) -> List[ItemML]:
+    """Bytes da API de busca → itens só com os campos usados"""
+    itens = []
+    for bruto in _decoder.decode(corpo).results or []:
+        try:
+            itens.append(_decoder_item.decode(bruto))
+        except msgspec.ValidationError as e:
+            logger.debug("Item ML fora do padrão ignorado: %s", e)
+    return itens
+
+
+def _inteiro(valor: Escalar) -> int:
+    try:
+        return int(float(valor))
+    except (TypeError, ValueError):
+        return 0
+
+
+async def scrape_mercadolivre(keyword: str, preco_max: int) -> List[Produto]:
     """
     Busca produtos no Mercado Livre via API oficial.
     Retorna lista de produtos que parecem erro de preço.
@@ -40,9 +106,10 @@ async def scrape_mercadolivre(keyword: str, preco_max: int) -> List[dict]:
     for tentativa in range(2):
       try:
         await asyncio.sleep(random.uniform(0.5, 1.5))
+        inicio = time.perf_counter()
         async with aiohttp.ClientSession() as session:
-            async with session.get(
-                ML_API_URL,
+            async with egress.requisicao(
+                session, LOJA, ML_API_URL,
                 params=params,
                 headers=headers,
                 timeout=aiohttp.ClientTimeout(total=Config.REQUEST_TIMEOUT),
@@ -52,48 +119,56 @@ async def scrape_mercadolivre(keyword: str, preco_max: int) -> List[dict]:
                     await asyncio.sleep(3 + tentativa * 2)
                     continue
                 if resp.status != 200:
-                    logger.warning(f"ML retornou {resp.status} para '{keyword}'")
+                    logger.warning(
+                        "ML retornou %d para '%s'", resp.status, keyword,
+                        extra={"loja": LOJA, "keyword": keyword, "status": resp.status},
+                    )
                     return []
 
-                data = await resp.json()
-                items = data.get("results", [])
+                items = decodificar(await resp.read())
 
                 for item in items:
                     produto = _processar_item_ml(item, keyword)
                     if produto:
                         produtos.append(produto)
+
+                latencia_ms = (time.perf_counter() - inicio) * 1000
+                logger.info(
+                    "ML: %d itens em %.0fms para '%s'", len(items), latencia_ms, keyword,
+                    extra={"loja": LOJA, "keyword": keyword, "latencia_ms": round(latencia_ms, 1),
+                           "itens": len(items), "status": resp.status},
+                )
                 break  # sucesso
 
       except asyncio.TimeoutError:
-        logger.warning(f"Timeout no ML para '{keyword}'")
+        logger.warning("Timeout no ML para '%s'", keyword, extra={"loja": LOJA, "keyword": keyword})
         break
       except Exception as e:
-        logger.error(f"Erro ML scraper '{keyword}': {e}")
+        logger.error("Erro ML scraper '%s': %s", keyword, e, extra={"loja": LOJA, "keyword": keyword})
         break
 
     return produtos
 
 
-def _processar_item_ml(item: dict, keyword: str) -> Optional[dict]:
+def _processar_item_ml(item: ItemML, keyword: str) -> Optional[Produto]:
     """Processa um item do ML e verifica se é erro de preço"""
     try:
-        preco = float(item.get("price", 0))
+        preco = float(item.price or 0)
         if preco <= 0:
             return None
 
         # Preço original (antes do desconto)
         preco_original = preco
-        atributos = item.get("attributes", [])
-        for attr in atributos:
-            if attr.get("id") == "ORIGINAL_PRICE":
+        for attr in item.attributes or []:
+            if attr.id == "ORIGINAL_PRICE":
                 try:
-                    preco_original = float(attr["value_struct"]["number"])
+                    preco_original = float(attr.value_struct.number)
                 except Exception:
                     pass
 
         # Tentar pegar original_price do campo direto
-        if item.get("original_price") and item["original_price"] > preco:
-            preco_original = float(item["original_price"])
+        if item.original_price and float(item.original_price) > preco:
+            preco_original = float(item.original_price)
 
         # Calcular desconto
         if preco_original <= preco or preco_original <= 0:
@@ -104,21 +179,23 @@ def _processar_item_ml(item: dict, keyword: str) -> Optional[dict]:
         desconto_pct = ((preco_original - preco) / preco_original) * 100
 
         # ID único para deduplicação
-        prod_id = hashlib.md5(f"ml_{item.get('id','')}_{preco}".encode()).hexdigest()
-
-        return {
-            "id": prod_id,
-            "nome": item.get("title", "Produto sem nome"),
-            "preco": preco,
-            "preco_original": preco_original,
-            "desconto_pct": desconto_pct,
-            "loja": "Mercado Livre",
-            "link": item.get("permalink", "#"),
-            "keyword": keyword,
-            "seller": item.get("seller", {}).get("nickname", ""),
-            "disponivel": item.get("available_quantity", 0),
-        }
+        item_id = item.id if item.id is not None else ""
+        prod_id = hashlib.md5(f"ml_{item_id}_{preco}".encode()).hexdigest()
+
+        return Produto(
+            id=prod_id,
+            anuncio_id=f"ml_{item_id}",
+            nome=str(item.title) if item.title is not None else "Produto sem nome",
+            preco=preco,
+            preco_original=preco_original,
+            desconto_pct=desconto_pct,
+            loja=LOJA,
+            link=str(item.permalink) if item.permalink is not None else "#",
+            keyword=keyword,
+            seller=str((item.seller.nickname if item.seller else None) or ""),
+            disponivel=_inteiro(item.available_quantity),
+        )
 
     except Exception as e:
-        logger.debug(f"Erro ao processar item ML: {e}")
+        logger.debug("Erro ao processar item ML: %s", e)
         return None
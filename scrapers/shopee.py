@@ -1,6 +1,9 @@
 """
 🛒 Scraper — Shopee Brasil
    Usa a API interna de busca da Shopee
+
+   Como no ML, a resposta é decodificada com msgspec projetando só os
+   campos lidos de item_basic, item por item e sem tipagem estrita.
 """
 
 import asyncio
@@ -8,15 +11,59 @@ import hashlib
 import logging
 import random
 import re
-from typing import List, Optional
+import time
+from typing import List, Optional, Union
 
 import aiohttp
+import msgspec
 
+import egress
 from config import Config
+from models import Produto
 
 logger = logging.getLogger("Shopee-Scraper")
 
 SHOPEE_API = "https://shopee.com.br/api/v4/search/search_items"
+LOJA = "Shopee"
+
+Numero = Union[int, float, str, None]
+
+
+class InfoShopee(msgspec.Struct):
+    name: Numero = None
+    price_min: Numero = None
+    price: Numero = None
+    price_min_before_discount: Numero = None
+    price_before_discount: Numero = None
+    raw_discount: Numero = None
+    discount: Numero = None
+    shopid: Union[int, str, None] = None
+    itemid: Union[int, str, None] = None
+    id: Union[int, str, None] = None
+
+
+class ItemShopee(InfoShopee):
+    # Algumas versões da API trazem os campos direto no item, sem item_basic
+    item_basic: Optional[InfoShopee] = None
+
+
+class RespostaShopee(msgspec.Struct):
+    items: Optional[List[msgspec.Raw]] = None
+
+
+_decoder = msgspec.json.Decoder(RespostaShopee, strict=False)
+_decoder_item = msgspec.json.Decoder(ItemShopee, strict=False)
+
+
+def decodificar(corpo: bytes) -> List[ItemShopee]:
+    """Bytes da API de busca → itens só com os campos usados"""
+    itens = []
+    for bruto in _decoder.decode(corpo).items or []:
+        try:
+            itens.append(_decoder_item.decode(bruto))
+        except msgspec.ValidationError as e:
+            logger.debug("Item Shopee fora do padrão ignorado: %s", e)
+    return itens
 
 
 def _headers() -> dict:
@@ -40,7 +87,7 @@ def _parse_preco(centavos) -> float:
         return 0.0
 
 
-async def scrape_shopee(keyword: str, preco_max: int) -> List[dict]:
+async def scrape_shopee(keyword: str, preco_max: int) -> List[Produto]:
     """Busca produtos na Shopee via API interna."""
     produtos = []
 
@@ -59,47 +106,57 @@ async def scrape_shopee(keyword: str, preco_max: int) -> List[dict]:
 
     try:
         await asyncio.sleep(random.uniform(1.0, 2.5))
+        inicio = time.perf_counter()
         async with aiohttp.ClientSession() as session:
-            async with session.get(
-                SHOPEE_API,
+            async with egress.requisicao(
+                session, LOJA, SHOPEE_API,
                 params=params,
                 headers=_headers(),
                 timeout=aiohttp.ClientTimeout(total=Config.REQUEST_TIMEOUT),
                 ssl=False,
             ) as resp:
                 if resp.status != 200:
-                    logger.warning(f"Shopee retornou {resp.status} para '{keyword}'")
+                    logger.warning(
+                        "Shopee retornou %d para '%s'", resp.status, keyword,
+                        extra={"loja": LOJA, "keyword": keyword, "status": resp.status},
+                    )
                     return []
 
-                data = await resp.json(content_type=None)
-                items = data.get("items", [])
+                items = decodificar(await resp.read())
 
                 for item in items[:20]:
                     produto = _processar_item(item, keyword, preco_max)
                     if produto:
                         produtos.append(produto)
 
+                latencia_ms = (time.perf_counter() - inicio) * 1000
+                logger.info(
+                    "Shopee: %d itens em %.0fms para '%s'", len(items), latencia_ms, keyword,
+                    extra={"loja": LOJA, "keyword": keyword, "latencia_ms": round(latencia_ms, 1),
+                           "itens": len(items), "status": resp.status},
+                )
+
     except asyncio.TimeoutError:
-        logger.warning(f"Timeout Shopee '{keyword}'")
+        logger.warning("Timeout Shopee '%s'", keyword, extra={"loja": LOJA, "keyword": keyword})
     except Exception as e:
-        logger.error(f"Erro Shopee scraper '{keyword}': {e}")
+        logger.error("Erro Shopee scraper '%s': %s", keyword, e, extra={"loja": LOJA, "keyword": keyword})
 
     return produtos
 
 
-def _processar_item(item: dict, keyword: str, preco_max: int) -> Optional[dict]:
+def _processar_item(item: ItemShopee, keyword: str, preco_max: int) -> Optional[Produto]:
     try:
-        info = item.get("item_basic", item)
+        info = item.item_basic or item
 
-        nome = info.get("name", "")
+        nome = str(info.name) if info.name is not None else ""
         if not nome:
             return None
 
         # Preço atual
         preco_raw = (
-            info.get("price_min")
-            or info.get("price")
-            or info.get("price_min_before_discount")
+            info.price_min
+            or info.price
+            or info.price_min_before_discount
             or 0
         )
         preco = _parse_preco(preco_raw)
@@ -108,39 +165,40 @@ def _processar_item(item: dict, keyword: str, preco_max: int) -> Optional[dict]:
 
         # Preço original (antes do desconto)
         preco_orig_raw = (
-            info.get("price_before_discount")
-            or info.get("price_min_before_discount")
+            info.price_before_discount
+            or info.price_min_before_discount
             or 0
         )
         preco_original = _parse_preco(preco_orig_raw)
 
         # Desconto
         desconto_pct = 0.0
-        raw_discount = info.get("raw_discount") or info.get("discount") or 0
+        raw_discount = info.raw_discount or info.discount or 0
         if raw_discount and float(raw_discount) > 0:
             desconto_pct = float(raw_discount)
         elif preco_original > preco and preco_original > 0:
             desconto_pct = ((preco_original - preco) / preco_original) * 100
 
         # Link
-        shop_id = info.get("shopid", "")
-        item_id = info.get("itemid", "") or info.get("id", "")
+        shop_id = info.shopid if info.shopid is not None else ""
+        item_id = info.itemid or info.id or ""
         nome_slug = re.sub(r"[^a-z0-9]+", "-", nome.lower())[:50]
         link = f"https://shopee.com.br/{nome_slug}-i.{shop_id}.{item_id}"
 
         prod_id = hashlib.md5(f"sh_{shop_id}_{item_id}_{preco}".encode()).hexdigest()
 
-        return {
-            "id": prod_id,
-            "nome": nome,
-            "preco": preco,
-            "preco_original": preco_original if preco_original > preco else 0,
-            "desconto_pct": desconto_pct,
-            "loja": "Shopee",
-            "link": link,
-            "keyword": keyword,
-        }
+        return Produto(
+            id=prod_id,
+            anuncio_id=f"sh_{shop_id}_{item_id}",
+            nome=nome,
+            preco=preco,
+            preco_original=preco_original if preco_original > preco else 0.0,
+            desconto_pct=desconto_pct,
+            loja=LOJA,
+            link=link,
+            keyword=keyword,
+        )
 
     except Exception as e:
-        logger.debug(f"Erro ao processar item Shopee: {e}")
+        logger.debug("Erro ao processar item Shopee: %s", e)
         return None
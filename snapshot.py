@@ -0,0 +1,92 @@
+"""
+💾 Snapshot — Warm restart do bot
+   Salva periodicamente o estado em memória (monitor, dedup, cursor do ciclo,
+   fila de envio, estado estatístico) num único arquivo pickle (protocolo 5)
+   e restaura no boot.
+
+   Cada módulo registra um par (exportar, importar) com registrar(). O
+   salvar() roda no event loop, então só entra estado pequeno: o price_db
+   (até dezenas de MB) fica de fora e usa o próprio price_history.json.
+"""
+
+import logging
+import os
+import pickle
+import time
+from typing import Any, Callable, Dict, Tuple
+
+from config import Config
+
+logger = logging.getLogger("Snapshot")
+
+SNAPSHOT_VERSAO = 1
+
+# nome → (exportar, importar)
+_provedores: Dict[str, Tuple[Callable[[], Any], Callable[[Any], None]]] = {}
+_ultimo_snapshot = 0.0
+
+
+def registrar(nome: str, exportar: Callable[[], Any], importar: Callable[[Any], None]):
+    """Registra um provedor de estado para entrar no snapshot"""
+    _provedores[nome] = (exportar, importar)
+
+
+def salvar() -> bool:
+    """Grava o snapshot de forma atômica (arquivo temporário + rename)"""
+    global _ultimo_snapshot
+    dados = {"versao": SNAPSHOT_VERSAO, "criado_em": time.time(), "estado": {}}
+    for nome, (exportar, _) in _provedores.items():
+        try:
+            dados["estado"][nome] = exportar()
+        except Exception as e:
+            logger.error(f"Erro ao exportar '{nome}' para o snapshot: {e}")
+
+    tmp = f"{Config.SNAPSHOT_FILE}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            pickle.dump(dados, f, protocol=5)
+        os.replace(tmp, Config.SNAPSHOT_FILE)
+    except Exception as e:
+        logger.error(f"Erro ao salvar snapshot: {e}")
+        return False
+
+    _ultimo_snapshot = time.monotonic()
+    return True
+
+
+def salvar_se_preciso() -> bool:
+    """Salva apenas se o intervalo mínimo entre snapshots já passou"""
+    if time.monotonic() - _ultimo_snapshot < Config.SNAPSHOT_INTERVAL_SECONDS:
+        return False
+    return salvar()
+
+
+def restaurar() -> bool:
+    """Restaura o último snapshot nos provedores registrados"""
+    if not os.path.exists(Config.SNAPSHOT_FILE):
+        return False
+
+    inicio = time.perf_counter()
+    try:
+        with open(Config.SNAPSHOT_FILE, "rb") as f:
+            dados = pickle.load(f)
+    except Exception as e:
+        logger.warning(f"Snapshot ilegível, iniciando do zero: {e}")
+        return False
+
+    if dados.get("versao") != SNAPSHOT_VERSAO:
+        logger.warning("Snapshot de versão diferente, ignorando")
+        return False
+
+    estado = dados.get("estado", {})
+    for nome, (_, importar) in _provedores.items():
+        if nome not in estado:
+            continue
+        try:
+            importar(estado[nome])
+        except Exception as e:
+            logger.error(f"Erro ao restaurar '{nome}' do snapshot: {e}")
+
+    ms = (time.perf_counter() - inicio) * 1000
+    logger.info(f"♻️ Snapshot restaurado em {ms:.1f}ms ({', '.join(estado)})")
+    return True